@@ -219,6 +219,7 @@ class BaseAcquisition:
         self.continuous_mode = False # if acquisition is in continuous mode
         
         self.lock_acquisition = threading.Lock() # ensures acquisition class runs properly if used in multiple threads.
+        self._state_changed = None # threading.Event set on state changes, provided by Core() class
         
         self.N_samples_to_acquire = None # number of samples to acquire
         self.n_channels  = 0 # number of channels
@@ -331,6 +332,16 @@ class BaseAcquisition:
             pos_next = pos+np.prod(shape)
             self.channel_pos.append( (pos, pos_next) )
             pos = pos_next
+            
+        # 4) columns of data channels in the flattened ring buffer. If data channels are in consecutive
+        #    columns, a slice is used, so retrieved data is a view and not a copy:
+        data_pos = [self.channel_pos[self.channel_names_all.index(name)] for name in self.channel_names]
+        if len(data_pos) == 0:
+            self._data_columns = None
+        elif all(data_pos[i][1] == data_pos[i+1][0] for i in range(len(data_pos)-1)):
+            self._data_columns = slice(data_pos[0][0], data_pos[-1][1])
+        else:
+            self._data_columns = np.concatenate([np.arange(*pos) for pos in data_pos])
     
     def add_virtual_channel(self, virtual_channel_name:str, source_channels:int|str|list, function:callable, *args, **kwargs)->None:
         """
@@ -512,10 +523,17 @@ class BaseAcquisition:
         """
         self.read_data()
             
+    def _notify_state_change(self)->None:
+        """Notifies the Core() class (if used) that the acquisition was stopped, is ready or was triggered.
+        """
+        if getattr(self, "_state_changed", None) is not None:
+            self._state_changed.set()
+            
     def stop(self)->None:
         """Stops acquisition run.
         """
         self.is_running = False
+        self._notify_state_change()
         
         # wait for the thread to finish if it exists:
         if hasattr(self, "background_thread") and threading.current_thread() == threading.main_thread():
@@ -529,9 +547,13 @@ class BaseAcquisition:
         This method is continuously called in the run_acquisition() method.
         """
         with self.lock_acquisition: # lock to secure variables
+            triggered_before = self.Trigger.triggered
             acquired_data = self._read_all_channels()
             self.Trigger.add_data(acquired_data)
             
+        if self.Trigger.triggered and not triggered_before:
+            self._notify_state_change()
+            
         if self.Trigger.finished or not self.is_running:   
             self.stop()
             self.terminate_data_source()
@@ -563,6 +585,7 @@ class BaseAcquisition:
         # if acquisition is used in some other classes, wait until all acquisition sources are ready:
         if not self.is_standalone:
             self.is_ready = True    # this source is ready (other may not be)
+            self._notify_state_change()
             while not BaseAcquisition.all_acquisitions_ready: # until every source is ready
                 # NOTE: BaseAcquisition.all_acquisitions_ready is set to True by Core() class that handles multiple sources
                 time.sleep(0.01)
@@ -807,14 +830,10 @@ class BaseAcquisition:
                 data_return.append( flattened_data[:, pos[0]:pos[1]].reshape( (flattened_data.shape[0], *shape) ) )
                 
         elif data_to_return=="data":
-            channels = [self.channel_names_all.index(name) for name in self.channel_names]
-            if len(channels)==0:
+            if self._data_columns is None:
                 raise ValueError(f"No data channels are defined in {self.acquisition_name}.")
             
-            pos_list = [np.arange(self.channel_pos[channel][0], self.channel_pos[channel][1]) for channel in channels]
-            pos_list = np.concatenate(pos_list)
-            
-            data_return = flattened_data[:, pos_list]
+            data_return = flattened_data[:, self._data_columns]
         elif data_to_return=="flattened": # return flattened buffer
             data_return = flattened_data
         else:
@@ -914,11 +933,8 @@ class BaseAcquisition:
         
         if len(self.channel_names_video) > 0:
             # get data only:
-            idx_signal_channels = [self.channel_names_all.index(name) for name in self.channel_names]
-            pos_list = [np.arange(self.channel_pos[channel][0], self.channel_pos[channel][1]) for channel in idx_signal_channels]
-            if len(pos_list) > 0:
-                pos_list = np.concatenate(pos_list)
-                data_only = data[:, pos_list]
+            if self._data_columns is not None:
+                data_only = data[:, self._data_columns]
             else:
                 data_only = np.array([]) # no data channels
                 
@@ -3,19 +3,20 @@ import datetime
 import os
 import pathlib
 import numpy as np
-import keyboard
-from beautifultable import BeautifulTable
 
 #import h5py
 
 import threading
-import pickle
+import collections
+import heapq
 import sys
 import traceback
-from .utils import load_measurement
+from .utils import _dump_frame, _frame_buffers, _write_buffers, _UringWriter
         
 class Core():
-    def __init__(self, acquisitions, generations=None, controls=None, visualization=None):
+    _hotkey_table = None # rendered hotkey table, see _print_table()
+    
+    def __init__(self, acquisitions, generations=None, controls=None, visualization=None, run_uring=False):
         """
         Initializes the Core instance by initializing its acquisition, generation, control and visualization sources. 
         
@@ -24,6 +25,9 @@ class Core():
             generations (list): list of generation sources. If None, initializes as empty list.
             controls (list): list of control sources. If None, initializes as empty list.
             visualization: visualization source. If None, initializes as empty.
+            run_uring (bool): if True, periodic saving submits file writes through Linux io_uring. Requires the 
+                              optional 'liburing' package. If io_uring is not available, regular writes are used. 
+                              Defaults to False.
 
         """
         acquisitions = [] if acquisitions is None else acquisitions
@@ -34,6 +38,7 @@ class Core():
         self.generations   = generations  if isinstance(generations, list ) else [generations]
         self.controls      = controls     if isinstance(controls,    list ) else [controls]
         self.visualization = visualization
+        self.run_uring     = run_uring
         
         self.acquisition_names = [acq.acquisition_name for acq in self.acquisitions]
         self.generation_names  = [gen.generation_name for gen in self.generations]
@@ -55,6 +60,9 @@ class Core():
         # Added functions to be called during measurement:
         self.additional_check_functions = []
         
+        # Set by acquisition and generation sources when their state changes (see _check_events()):
+        self._state_changed = threading.Event()
+        
     def __repr__(self):
         """Returns description of the Core object settings.
 
@@ -164,94 +172,94 @@ class Core():
         
         self.first = True # for printing trigger the first time.
         
-        if self.visualization is None:
-            self._keyboard_hotkeys_setup()
-            if self.verbose == 2:
-                self._print_table()
-        else:
-            self.verbose = 0
-        
-        if self.verbose in [1, 2]:
-            print('\nWaiting for trigger...', end='')
-
-        ####################
-        # Thread setting:  #
-        ####################
-        
-        self.lock = threading.Lock() # for locking a thread if needed.    
-        self.stop_event = threading.Event()
-        self.triggered_globally = False
-        self.thread_list = []
-
-        # Make separate threads for data acquisition
-        for acquisition in self.acquisitions:
-            # update triggers from acquisition to match acquired samples to run_time:
-            acquisition.is_standalone = False
-            acquisition.reset_trigger()
-            if self.save_interval is not None:
-                # update ringbuffer size to 1.2x the save size:
-                acquisition.set_continuous_mode(True, measurement_duration=self.measurement_duration)
-                acquisition.update_trigger_parameters(duration=1.2*self.save_interval, duration_unit="seconds")
+        try:
+            if self.visualization is None:
+                self._keyboard_hotkeys_setup()
+                if self.verbose == 2:
+                    self._print_table()
             else:
-                acquisition.set_continuous_mode(False)
+                self.verbose = 0
+        
+            if self.verbose in [1, 2]:
+                print('\nWaiting for trigger...', end='')
+
+            ####################
+            # Thread setting:  #
+            ####################
+        
+            self.lock = threading.Lock() # for locking a thread if needed.    
+            self.stop_event = threading.Event()
+            self.triggered_globally = False
+            self.thread_list = []
+
+            # Make separate threads for data acquisition
+            for acquisition in self.acquisitions:
+                # update triggers from acquisition to match acquired samples to run_time:
+                acquisition.is_standalone = False
+                acquisition.reset_trigger()
+                if self.save_interval is not None:
+                    # update ringbuffer size to 1.2x the save size:
+                    acquisition.set_continuous_mode(True, measurement_duration=self.measurement_duration)
+                    acquisition.update_trigger_parameters(duration=1.2*self.save_interval, duration_unit="seconds")
+                else:
+                    acquisition.set_continuous_mode(False)
                 
-            if self.measurement_duration is not None and self.save_interval is None:
-                acquisition.update_trigger_parameters(duration=self.measurement_duration, duration_unit="seconds")
+                if self.measurement_duration is not None and self.save_interval is None:
+                    acquisition.update_trigger_parameters(duration=self.measurement_duration, duration_unit="seconds")
                 
-            if autostart:
-                acquisition.update_trigger_parameters(level=1e40)   
+                if autostart:
+                    acquisition.update_trigger_parameters(level=1e40)   
                 
-            thread_acquisition = threading.Thread(target= self._stop_event_handling(acquisition.run_acquisition)  )
-            self.thread_list.append(thread_acquisition)
-
-        # If generation is present, create generation thread
-        for generation in self.generations:
-            thread_generation  = threading.Thread(target= self._stop_event_handling(generation.run_generation) )
-            self.thread_list.append(thread_generation)
-
-        # If control is present, create control thread
-        for control in self.controls:
-            thread_control = threading.Thread(target= self._stop_event_handling(control.run_control) )
-            self.thread_list.append(thread_control)
-        
-        time.sleep(0.005)     
-        # check events that can stop the acquisition:
-        thread_check_events = threading.Thread(target= self._stop_event_handling( self._check_events) )
-        self.thread_list.append(thread_check_events)
-        
-        # periodic data saving:
-        if self.save_interval is not None:
-            # create saving thread
-            thread_periodic_saving = threading.Thread(target= self._stop_event_handling(self._save_measurement_periodically) )
-            self.thread_list.append(thread_periodic_saving)
-            
-        # start all threads:
-        for thread in self.thread_list:
-            thread.start()
-        time.sleep(0.2)
-
-        # TODO: using self.stop_event.is_set() terminate threads if one thread fails.
-        #       self.stop_event.set() is called in _stop_event_handling() wrapper function
-        if self.visualization is not None:
-            self._stop_event_handling( self.visualization.run )(self)
-        else:
-            # Main Loop if no visualization:
-            while self.is_running_global:
-                time.sleep(0.5)
+                acquisition._state_changed = self._state_changed
+                
+                thread_acquisition = threading.Thread(target= self._stop_event_handling(acquisition.run_acquisition)  )
+                self.thread_list.append(thread_acquisition)
+
+            # If generation is present, create generation thread
+            for generation in self.generations:
+                generation._state_changed = self._state_changed
+                thread_generation  = threading.Thread(target= self._stop_event_handling(generation.run_generation) )
+                self.thread_list.append(thread_generation)
+
+            # If control is present, create control thread
+            for control in self.controls:
+                thread_control = threading.Thread(target= self._stop_event_handling(control.run_control) )
+                self.thread_list.append(thread_control)
+        
+            time.sleep(0.005)     
+            # check events that can stop the acquisition and periodic data saving:
+            thread_housekeeping = threading.Thread(target= self._run_housekeeping )
+            self.thread_list.append(thread_housekeeping)
+            
+            # start all threads:
+            for thread in self.thread_list:
+                thread.start()
+            time.sleep(0.2)
 
-        # on exit:
-        self.stop_acquisition_and_generation()
-        for thread in self.thread_list:
-            thread.join()
+            # TODO: using self.stop_event.is_set() terminate threads if one thread fails.
+            #       self.stop_event.set() is called in _stop_event_handling() wrapper function
+            if self.visualization is not None:
+                self._stop_event_handling( self.visualization.run )(self)
+            else:
+                # Main Loop if no visualization:
+                while self.is_running_global:
+                    time.sleep(0.5)
+
+            # on exit:
+            self.stop_acquisition_and_generation()
+            for thread in self.thread_list:
+                thread.join()
             
-        if self.verbose in [1, 2]:
-            print('Measurement finished.')
-        
-        if self.visualization is None:
-            self._keyboard_hotkeys_remove()
+            if self.verbose in [1, 2]:
+                print('Measurement finished.')
+        finally:
+            # the terminal settings are restored also if the measurement is interrupted (e.g. Ctrl+C)
+            if self.visualization is None:
+                self._keyboard_hotkeys_remove()
     
     def _stop_event_handling(self, func):
-        """Used to handle Exception events in a process.
+        """Used to handle Exception events in a process. Wraps the run methods of acquisition, generation,
+        control and visualization sources.
 
         Args:
             func (func): Function that will be run in thread.
@@ -266,32 +274,83 @@ class Core():
                 
         return wrapper
     
+    def _run_housekeeping(self):
+        """
+        Runs housekeeping tasks of the measurement in one thread: checking events (see _check_events()) and,
+        if save_interval is set, periodic saving (see _save_measurement_periodically()).
+        
+        Each task is a generator that yields the delay (in seconds) until it should be resumed. Tasks are 
+        scheduled with a heap ordered by wake-up time. While event checks are running, a state change signalled 
+        by any source wakes them up immediately. Returns when all tasks are finished.
+        
+        Internal loops are not wrapped with _stop_event_handling(), exceptions are handled here for each task 
+        separately, so that a failing event check (e.g. a user check function) does not stop periodic saving.
+        """
+        # (wake-up time, task index, task), task index 0 is reserved for event checks:
+        tasks = [(time.time(), 0, self._check_events())]
+        if self.save_interval is not None:
+            tasks.append((time.time(), 1, self._save_measurement_periodically()))
+        
+        while tasks:
+            timeout = tasks[0][0] - time.time()
+            if timeout > 0:
+                if not any(index == 0 for _, index, _ in tasks): # event checks are finished
+                    time.sleep(timeout)
+                elif self._state_changed.wait(timeout): # state change - check events now
+                    tasks = [(time.time() if index == 0 else wake_time, index, task) for wake_time, index, task in tasks]
+                    heapq.heapify(tasks)
+                continue
+        
+            wake_time, index, task = heapq.heappop(tasks)
+            try:
+                delay = next(task)
+            except StopIteration:
+                continue
+            except Exception:
+                if index == 0:
+                    print("An exception occurred in checking events:")
+                else:
+                    print("An exception occurred in periodic saving:")
+                    if getattr(self, "_save_queue", None) is not None: # let the writer thread finish
+                        self._save_queue.append(None)
+                        self._save_queue_updated.set()
+                traceback.print_exception(*sys.exc_info())
+                self.stop_event.set()
+                continue
+            heapq.heappush(tasks, (time.time() + delay, index, task))
+
     def _check_events(self):
         """
         Checks for different events required to perform measurements. 
         It checks whether all acquisition and generation sources are running or not; if any of them are not running, 
         then it terminates the measurement. It also checks if any acquisition sources are triggered or if any additional 
         check functions added with add_check_events() method return True. If either of these conditions returns True, 
-        it terminates the measurement. This function runs continuously in a separate thread until the is_running_global 
+        it terminates the measurement. This generator is run by _run_housekeeping() until the is_running_global 
         variable is set to False.
+        
+        Between checks, it waits until a source signals a state change (stop, ready, trigger). Sources that
+        do not signal their state (controls) and additional check functions are polled every 50 ms.
 
         Args:
             None
             
-        Returns:
-            None
+        Yields:
+            float: maximum time in seconds until the next check
         """
+        failed_check_functions = []
         while self.is_running_global:
+            self._state_changed.clear() # changes during the checks below are kept for the next wait
+            
             acquisition_running = True
-            if all(not acquisition.is_running for acquisition in self.acquisitions) and len(self.acquisitions) > 0:
+            if len(self.acquisitions) > 0 and not any(acquisition.is_running for acquisition in self.acquisitions):
                 acquisition_running = False # end if all acquisitions are ended
             
             generation_running = True
-            if all(not generation.is_running for generation in self.generations) and len(self.generations) > 0:
+            if len(self.generations) > 0 and not any(generation.is_running for generation in self.generations):
                 generation_running = False
                 
             control_running = True
-            if all(not control.is_running for control in self.controls) and len(self.controls) > 0:
+            if len(self.controls) > 0 and not any(control.is_running for control in self.controls):
                 control_running = False
                 
             self.is_running_global = acquisition_running and generation_running and control_running
@@ -304,7 +363,8 @@ class Core():
                     if self.autostart:
                         self.start_acquisition()
             
-            if any(acq.is_triggered() for acq in self.acquisitions) and not self.triggered_globally:
+            # trigger latches, so sources are no longer polled once the measurement is triggered:
+            if not self.triggered_globally and any(acq.is_triggered() for acq in self.acquisitions):
                 self.triggered_globally = True
                 
             if self.first and self.triggered_globally:
@@ -317,10 +377,24 @@ class Core():
             # additional functionalities added with 'add_check_events()' method:   
             if hasattr(self, "additional_check_functions"):
                 for fun in self.additional_check_functions:
-                    if fun(self):
+                    if fun in failed_check_functions:
+                        continue
+                    try:
+                        stop = fun(self)
+                    except Exception:
+                        # a failing check function is skipped in this run, the other checks and periodic saving continue
+                        print(f"An exception occurred in the check function {getattr(fun, '__name__', fun)}:")
+                        traceback.print_exception(*sys.exc_info())
+                        self.stop_event.set()
+                        failed_check_functions.append(fun)
+                        continue
+                    if stop:
                         self.stop_acquisition_and_generation()
-                                                
-            time.sleep(0.05)   
+                        
+            if len(self.additional_check_functions) > 0 or len(self.controls) > 0:
+                yield 0.05
+            else:
+                yield 0.5
             
     def add_check_events(self, *args):
         """
@@ -419,17 +493,71 @@ class Core():
             self.global_trigger_settings["type"]          = trigger_type
             
     def _keyboard_hotkeys_setup(self):
-        """Adds keyboard hotkeys for interaction.
+        """Adds keyboard hotkeys for interaction. 
+        
+        If the measurement is run from a terminal, keys are read from the console (stdin) in a separate
+        daemon thread and the terminal is switched to cbreak mode (no line buffering) until 
+        '_keyboard_hotkeys_remove' is called. Otherwise (e.g. Jupyter notebook), the 'keyboard' 
+        package is used.
+        """
+        self.hotkeys = {'s': self.start_acquisition, 'q': self.stop_acquisition_and_generation}
+        self.hotkey_ids = []
+        self._terminal_settings = None
+        
+        if sys.stdin is None or not sys.stdin.isatty():
+            import keyboard
+            for key, fun in self.hotkeys.items():
+                self.hotkey_ids.append(keyboard.add_hotkey(key, fun))
+            return
+        
+        if os.name != 'nt':
+            import termios
+            import tty
+            self._terminal_settings = termios.tcgetattr(sys.stdin.fileno())
+            tty.setcbreak(sys.stdin.fileno())
+            
+        thread_hotkeys = threading.Thread(target=self._read_hotkeys, daemon=True)
+        thread_hotkeys.start()
+        
+    def _read_hotkeys(self):
+        """Reads keys from the console and calls the corresponding hotkey functions, until the 
+        measurement is finished. Keys are polled with a 0.1 s timeout.
         """
-        id1 = keyboard.add_hotkey('s', self.start_acquisition)
-        id2 = keyboard.add_hotkey('q', self.stop_acquisition_and_generation)
-        self.hotkey_ids = [id1, id2]
+        if os.name == 'nt':
+            import msvcrt
+        else:
+            import select
+            fd = sys.stdin.fileno()
+            
+        while self.is_running_global:
+            if os.name == 'nt':
+                if not msvcrt.kbhit():
+                    time.sleep(0.1)
+                    continue
+                key = msvcrt.getwch()
+            else:
+                if not select.select([fd], [], [], 0.1)[0]:
+                    continue
+                # read from the file descriptor, keys buffered by sys.stdin would not be reported by select()
+                key = os.read(fd, 1).decode(errors='ignore')
+                
+            fun = self.hotkeys.get(key.lower())
+            if fun is not None:
+                fun()
         
     def _keyboard_hotkeys_remove(self):
-        """Removes all keyboard hotkeys defined by 'keyboard_hotkeys_setup'.
+        """Removes all keyboard hotkeys defined by 'keyboard_hotkeys_setup' and restores terminal settings.
         """
-        for id in self.hotkey_ids:
-            keyboard.remove_hotkey(id)
+        if len(self.hotkey_ids) > 0:
+            import keyboard
+            for id in self.hotkey_ids:
+                keyboard.remove_hotkey(id)
+            self.hotkey_ids = []
+            
+        if self._terminal_settings is not None:
+            import termios
+            termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, self._terminal_settings)
+            self._terminal_settings = None
             
     def stop_acquisition_and_generation(self):
         """Stops all acquisition and generation sources.
@@ -454,17 +582,23 @@ class Core():
             # 1 acq source triggers others through CustomPyTrigger parent class
             with self.acquisitions[0].lock_acquisition: 
                 self.acquisitions[0].activate_trigger()
+            self._state_changed.set()
     
     def _print_table(self):
         """Prints the table of the hotkeys of the application to the console.
         The table contains the hotkeys, as well as a short description of each
-        hotkey. The table is printed using the BeautifulTable library.
+        hotkey. The table is printed using the BeautifulTable library, it is rendered
+        only once and reused in subsequent runs.
         """
-        table = BeautifulTable()
-        table.rows.append(["s", "Start the measurement manually (ignore trigger)"])
-        table.rows.append(["q", "Stop the measurement"])
-        table.columns.header = ["HOTKEY", "DESCRIPTION"]
-        print(table)
+        if Core._hotkey_table is None:
+            from beautifultable import BeautifulTable
+            
+            table = BeautifulTable()
+            table.rows.append(["s", "Start the measurement manually (ignore trigger)"])
+            table.rows.append(["q", "Stop the measurement"])
+            table.columns.header = ["HOTKEY", "DESCRIPTION"]
+            Core._hotkey_table = str(table)
+        print(Core._hotkey_table)
      
     def _get_measurement_dict_PLOT(self):
         """
@@ -623,25 +757,43 @@ class Core():
         filename = f'{stamp}{name}.pkl'
         path = os.path.join(root, filename)
         with open(path, 'wb') as f:
-            pickle.dump(measurement_dict, f, protocol=-1)
+            _dump_frame(measurement_dict, f)
 
         return path  
      
     def _save_measurement_periodically(self):
-        """Periodically saves the measurement data."""
+        """Periodically collects new measurement data. The collected data is queued and written to files
+        by _write_periodic_saves() in a separate thread, so a slow file system does not delay reading 
+        new data from the acquisition ring buffers. This generator is run by _run_housekeeping().
+        
+        Yields:
+            float: time in seconds until the generator should be resumed
+        """
         name = self.run_name
         root = self.root
         root = str( pathlib.Path(root).absolute() ) # convert to absolute path
 
         start_time = time.time()
-        file_index = 0
         file_created = False
+        
+        # single producer (this thread), single consumer (writer thread) queue of (file_name, data) chunks:
+        self._save_queue = collections.deque()
+        self._save_queue_updated = threading.Event()
+        self._save_failed = False # set by the writer thread if writing fails
+        thread_writer = threading.Thread(target= self._write_periodic_saves, args=(root, ) )
+        thread_writer.start()
 
         running = True
         delay_saving = 0.5  # seconds
         delay_start = time.time()
         while running:
-            time.sleep(0.2)
+            yield 0.2
+
+            if self._save_failed: # stop the measurement, new data could not be saved
+                print("Periodic saving failed, the measurement is stopped.")
+                self.stop_acquisition_and_generation()
+                thread_writer.join()
+                return
 
             # implemented time delay:
             if self.is_running_global:
@@ -663,20 +815,102 @@ class Core():
                         #file_name = f"{now.strftime('%Y%m%d_%H%M%S')}_{name}.hdf5"
                         file_created = True
 
-                    file_index = self._open_and_save(file_name, root, file_index)   
+                    self._save_queue.append( (file_name, self._get_new_measurement_dict()) )
+                    self._save_queue_updated.set()
 
-        if self.triggered_globally:
-            time.sleep(0.5)
-            self._open_and_save(file_name, root, file_index)
+        if self.triggered_globally and not self._save_failed:
+            yield 0.5
+            if not file_created:
+                now = datetime.datetime.now()
+                file_name = f"{now.strftime('%Y%m%d_%H%M%S')}_{name}.pkl"
+            self._save_queue.append( (file_name, self._get_new_measurement_dict()) )
+            
+        self._save_queue.append(None) # marks the end of periodic saving
+        self._save_queue_updated.set()
+        thread_writer.join()
+        
+    def _get_new_measurement_dict(self):
+        """Returns only new data of triggered acquisition sources, limited to channels selected for saving.
+        
+        Returns:
+            dict: measurement dictionary, see get_measurement_dict() method.
+        """
+        data = {}
+        for acq in self.acquisitions:
+            name = acq.acquisition_name
+            if acq.is_triggered():
+                measurement = acq.get_measurement_dict(N_points="new")
+                if self._save_channels is not None:
+                    measurement = self._remove_channels_from_acq_dict(measurement, self._save_channels)
+                    if measurement == {}:
+                        continue
 
-    def _open_and_save(self, file_name_base, root, file_index):
+                data[name] = measurement
+                
+        return data
+        
+    def _write_periodic_saves(self, root):
+        """Writes data queued by _save_measurement_periodically() to files. All chunks waiting in the queue 
+        are written as one batch. Runs in a separate thread until the end of periodic saving.
+        
+        Args:
+            root (str): directory to save to
+        """
+        file_index = 0
+        self._save_files = {} # open (append-only) file descriptors of periodically saved files
+        self._uring_writer = None
+        try:
+            if self.run_uring:
+                try:
+                    self._uring_writer = _UringWriter()
+                except Exception as e:
+                    print(f"io_uring is not available ({e}). Regular file writes are used for periodic saving.")
+        
+            finished = False
+            while not finished:
+                self._save_queue_updated.wait()
+                self._save_queue_updated.clear()
+            
+                batch = []
+                while self._save_queue:
+                    chunk = self._save_queue.popleft()
+                    if chunk is None:
+                        finished = True
+                    else:
+                        batch.append(chunk)
+                    
+                for file_name, data in batch:
+                    file_index = self._open_and_save(file_name, root, file_index, data)
+                if self._uring_writer is not None: # one submission for the whole batch
+                    self._uring_writer.submit_and_wait()
+        except BaseException:
+            print("An exception occurred in periodic saving:")
+            traceback.print_exception(*sys.exc_info())
+            self._save_failed = True # _save_measurement_periodically() stops the measurement
+            self._save_queue.clear() # queued data can not be saved
+            self.stop_event.set()
+        finally:
+            if self._uring_writer is not None:
+                try:
+                    self._uring_writer.close()
+                except Exception:
+                    traceback.print_exception(*sys.exc_info())
+                self._uring_writer = None
+            for fd in self._save_files.values():
+                os.close(fd)
+            self._save_files = {}
+
+    def _open_and_save(self, file_name_base, root, file_index, data):
         """
-        Open existing file and save new data.
+        Append new data to the periodically saved file. Each call appends only the data acquired since the 
+        previous call as a separate pickle frame, previously saved data is never read or rewritten.
+        Frames are combined when the file is loaded with load_measurement().
         
         Args:
             file_name_base (str): file name without index and extension
             root (str): directory to save to
             file_index (int): index of the file
+            data (dict): new data, as returned by _get_new_measurement_dict()
             
         Returns:
             int: updated file index
@@ -690,53 +924,34 @@ class Core():
         file_name = f"{file_name_base}_{file_index_str}{ext}"
         file_path = os.path.join(root, file_name)
 
-        # Load existing data
-        if os.path.exists(file_path):
-            current_file_size = os.path.getsize(file_path)
-        else:
-            current_file_size = 0
-
         # Check if file size exceeds 200 MB, create a new file with incremented index
-        if current_file_size >= max_file_size:
-            file_index += 1 # update file index
+        fd = self._save_files.get(file_path)
+        if fd is not None and os.fstat(fd).st_size >= max_file_size:
+            if self._uring_writer is not None: # complete queued writes before closing the file
+                self._uring_writer.submit_and_wait()
+            os.close(fd)
+            self._save_files.pop(file_path)
+            fd = None
             
-        file_index_str = str(file_index).zfill(4)
-        file_name = f"{file_name_base}_{file_index_str}{ext}"
-        file_path = os.path.join(root, file_name)
+            file_index += 1 # update file index
+            file_index_str = str(file_index).zfill(4)
+            file_name = f"{file_name_base}_{file_index_str}{ext}"
+            file_path = os.path.join(root, file_name)
         
-        if os.path.exists(file_path):
-            data = load_measurement(file_name, root)
-        else:
-            data = {}
+        if fd is None: # file descriptor is kept open until the end of periodic saving
+            flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0)
+            fd = os.open(file_path, flags)
+            self._save_files[file_path] = fd
 
-        # Update data with new measurements
-        for acq in self.acquisitions:
-            name = acq.acquisition_name
-            if acq.is_triggered():
-                measurement = acq.get_measurement_dict(N_points="new")
-                if self._save_channels is not None:
-                    measurement = self._remove_channels_from_acq_dict(measurement, self._save_channels)
-                    if measurement == {}:
-                        continue
+        if len(data) == 0:
+            return file_index
 
-                if name not in data:
-                    data[name] = measurement
-        
-                else:
-                    data[name]['time'] = np.concatenate((data[name]['time'], measurement['time']), axis=0)
-                    
-                    if 'data' in measurement.keys():
-                        new_data = measurement['data']
-                        data[name]['data'] = np.concatenate((data[name]['data'], new_data), axis=0)
-                    if 'video' in measurement.keys():
-                        new_video = measurement['video']
-                        data[name]['video'] = [np.concatenate((data[name]['video'][i], new_video[i]), axis=0) for i in range(len(new_video))]
-                    
-
-        # Save updated data
+        # Append new data (whole frame in one gathered write)
         with self.lock_write:
-            with open(file_path, 'wb') as f:
-                pickle.dump(data, f, protocol=-1)
+            if self._uring_writer is not None:
+                self._uring_writer.write(fd, _frame_buffers(data))
+            else:
+                _write_buffers(fd, _frame_buffers(data))
 
         return file_index
 
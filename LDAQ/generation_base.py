@@ -2,6 +2,7 @@ import os
 import numpy as np
 import time
 import copy
+import threading
 
 class BaseGeneration:
     """
@@ -15,6 +16,9 @@ class BaseGeneration:
         self.delay = 0.0
         self.is_running = True
         self.generation_name = "DefaultSignalGeneration"
+        self.generation_period = 0.01 # [s] wait between generate() calls if generation is run with block=True
+        self._stop_event = threading.Event()
+        self._state_changed = None # threading.Event set on state changes, provided by Core() class
 
     def generate(self):
         """
@@ -37,11 +41,20 @@ class BaseGeneration:
         
         self.set_data_source()
         if block:
-            while self.is_running:
+            stop_event = self._get_stop_event()
+            while self.is_running and not stop_event.is_set():
                 self.generate()
+                stop_event.wait(self.get_generation_period()) # returns immediately when stopped
         else:
             self.generate()
 
+    def get_generation_period(self):
+        """
+        EDIT in child class (Optional). Returns time in seconds between consecutive generate() calls
+        when generation is run with block=True.
+        """
+        return getattr(self, "generation_period", 0.01)
+
     def set_data_source(self):
         """
         EDIT in child class. The child should call methods that set the signal.
@@ -59,8 +72,20 @@ class BaseGeneration:
         Stops the generation.
         """
         self.is_running = False
+        self._get_stop_event().set()
         self.terminate_data_source()
+        if getattr(self, "_state_changed", None) is not None:
+            self._state_changed.set()
         
+    def _get_stop_event(self):
+        """
+        Returns the event that is set when the generation is stopped. It is created here if the child 
+        class does not call super().__init__().
+        """
+        if getattr(self, "_stop_event", None) is None:
+            self._stop_event = threading.Event()
+        return self._stop_event
+
     def add_delay(self, delay):
         """
         Adds delay before generation starts
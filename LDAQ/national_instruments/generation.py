@@ -1,7 +1,6 @@
 import os
 import numpy as np
 import time
-import copy
 
 from typing import Optional, Union
 
@@ -35,6 +34,13 @@ class NIGeneration(BaseGeneration):
             self.NITask_used = False
         elif isinstance(task_name, NITaskOutput):
             self.NITask_used = True
+            # constructor arguments and channels used to rebuild the task after termination (see set_data_source()):
+            self._task_args = {
+                'task_name': task_name.task_name,
+                'sample_rate': task_name.sample_rate,
+                'samples_per_channel': task_name.samples_per_channel,
+            }
+            self._task_channels = {name: dict(channel) for name, channel in task_name.channels.items()}
         else:
             raise TypeError("task_name has to be a string or NITaskOutput object.")
         
@@ -59,10 +65,9 @@ class NIGeneration(BaseGeneration):
         """
         if self.task_terminated:
             if self.NITask_used:
-                channels_base = copy.deepcopy(self.task_base.channels)
-                self.Task = NITaskOutput(self.task_base.task_name, self.task_base.sample_rate)
-                self.task_name = self.task_base.task_name
-                self.Task.channels = channels_base
+                self.Task = NITaskOutput(**self._task_args)
+                self.task_name = self._task_args['task_name']
+                self.Task.channels = {name: dict(channel) for name, channel in self._task_channels.items()}
 
             else:
                 self.Task = DAQTask(self.task_base)
@@ -86,6 +91,11 @@ class NIGeneration(BaseGeneration):
             raise ValueError("No signal set for generation.")
         self.Task.generate(self.signal, clear_task=False)
 
+    def get_generation_period(self):
+        """Returns half of the generated signal duration, so the signal is rewritten before the output buffer runs out.
+        """
+        return 0.5 * self.signal.shape[-1] / self.Task.sample_rate
+
     def clear_task(self):
         """Clears NI output task.
         """
@@ -3,13 +3,222 @@ This files is meant for functions that are useful for setting up workflow and an
 """
 
 import os
+import errno
 import numpy as np
 import pickle
 
+_OOB_FRAME_MAGIC = b"LDAQOOB5" # marks a pickle frame with out-of-band buffers (see _dump_frame())
+
+def _to_contiguous(obj):
+    """
+    Returns a copy of (nested) dictionaries and lists where all numpy arrays are C-contiguous.
+    Only contiguous arrays can be pickled out-of-band.
+    """
+    if isinstance(obj, np.ndarray):
+        return np.ascontiguousarray(obj)
+    elif isinstance(obj, dict):
+        return {key: _to_contiguous(value) for key, value in obj.items()}
+    elif isinstance(obj, list):
+        return [_to_contiguous(value) for value in obj]
+    else:
+        return obj
+
+def _frame_buffers(obj):
+    """
+    Pickles an object using pickle protocol 5 and returns the frame as a list of buffers. Data of numpy 
+    arrays is passed out-of-band, the returned buffers point directly to the array memory and are not copied.
+    
+    Frame layout: magic bytes, pickle stream length, number of buffers, pickle stream and 
+    (buffer length, buffer) pairs. All lengths are 8 byte little endian integers.
+    
+    Args:
+        obj (object): object to pickle (usually measurement dictionary)
+        
+    Returns:
+        list: bytes-like objects that make up the frame, in order
+    """
+    buffers = []
+    stream = pickle.dumps(_to_contiguous(obj), protocol=5, buffer_callback=buffers.append)
+    
+    frame = [_OOB_FRAME_MAGIC + len(stream).to_bytes(8, "little") + len(buffers).to_bytes(8, "little"), stream]
+    for buffer in buffers:
+        raw = buffer.raw()
+        frame.append(raw.nbytes.to_bytes(8, "little"))
+        frame.append(raw)
+    return frame
+
+def _dump_frame(obj, f):
+    """
+    Pickles an object into an open binary file, see _frame_buffers() for details.
+    
+    Args:
+        obj (object): object to pickle (usually measurement dictionary)
+        f (file): file opened in binary write or append mode
+    """
+    for buffer in _frame_buffers(obj):
+        f.write(buffer)
+        
+def _write_buffers(fd, buffers):
+    """
+    Writes all buffers to a file descriptor. Where available (POSIX), the buffers are written with a 
+    single gathered os.writev() call (repeated only on partial writes), otherwise with os.write() calls.
+    
+    Args:
+        fd (int): file descriptor opened for writing
+        buffers (list): bytes-like objects to write, in order
+    """
+    views = [memoryview(buffer).cast("B") for buffer in buffers]
+    views = [view for view in views if view.nbytes > 0]
+    
+    if hasattr(os, "writev"):
+        try:
+            iov_max = os.sysconf("SC_IOV_MAX")
+        except (ValueError, OSError):
+            iov_max = 1024
+            
+        i = 0
+        while i < len(views):
+            written = os.writev(fd, views[i:i+iov_max])
+            while i < len(views) and written >= views[i].nbytes: # skip fully written buffers
+                written -= views[i].nbytes
+                i += 1
+            if written > 0:
+                views[i] = views[i][written:]
+    else:
+        for view in views:
+            while view.nbytes > 0:
+                written = os.write(fd, view)
+                view = view[written:]
+
+class _UringWriter:
+    """
+    Writes frames to file descriptors using Linux io_uring (requires the optional ``liburing`` package).
+    Writes are only queued with write(), all queued writes are submitted at once and their completions
+    awaited with submit_and_wait(). Queued writes are linked, so they are executed in the queued order.
+    """
+    def __init__(self, entries=32):
+        """
+        Args:
+            entries (int): size of the submission queue. Defaults to 32.
+            
+        Raises:
+            ImportError: if liburing is not installed
+            OSError: if io_uring is not supported (non-Linux systems or old kernels)
+        """
+        import liburing
+        self.liburing = liburing
+        self.entries = entries
+        self.ring = liburing.io_uring()
+        self.cqe  = liburing.io_uring_cqe()
+        liburing.trap_error(liburing.io_uring_queue_init(entries, self.ring, 0))
+        self.pending = [] # (fd, views, iov) of queued writes, referenced until they complete
+        
+    def write(self, fd, buffers):
+        """Queues a gathered write of all buffers to the end of file.
+        
+        Args:
+            fd (int): file descriptor opened with O_APPEND flag
+            buffers (list): bytes-like objects to write, in order
+        """
+        if len(self.pending) == self.entries:
+            self.submit_and_wait()
+            
+        views = [memoryview(buffer).cast("B") for buffer in buffers]
+        views = [view for view in views if view.nbytes > 0]
+        iov = self.liburing.iovec(views)
+        sqe = self.liburing.io_uring_get_sqe(self.ring)
+        # offset is ignored for files opened with O_APPEND, data is always appended:
+        self.liburing.io_uring_prep_writev(sqe, fd, iov, len(views), 0)
+        self.liburing.io_uring_sqe_set_flags(sqe, self.liburing.IOSQE_IO_LINK)
+        self.pending.append((fd, views, iov))
+        
+    def submit_and_wait(self):
+        """Submits all queued writes with one system call and waits until they are completed.
+        Partially completed and cancelled writes are finished with _write_buffers().
+        """
+        if len(self.pending) == 0:
+            return
+        
+        self.liburing.io_uring_submit(self.ring)
+        for fd, views, iov in self.pending: # linked requests complete in order
+            self.liburing.io_uring_wait_cqe(self.ring, self.cqe)
+            written = self.cqe.res
+            self.liburing.io_uring_cqe_seen(self.ring, self.cqe)
+            
+            if written == -errno.ECANCELED: # previous write in the chain was not completed
+                written = 0
+            elif written < 0:
+                raise OSError(-written, os.strerror(-written))
+            
+            for j, view in enumerate(views): # write the rest of the frame
+                if written < view.nbytes:
+                    _write_buffers(fd, [view[written:]] + views[j+1:])
+                    break
+                written -= view.nbytes
+        self.pending = []
+        
+    def close(self):
+        """Waits for queued writes and releases the ring."""
+        self.submit_and_wait()
+        self.liburing.io_uring_queue_exit(self.ring)
+
+class _TruncatedFrameError(Exception):
+    """Raised when a frame ends before its full length could be read, e.g. if saving was interrupted."""
+
+def _read_exact(f, n):
+    """Reads exactly `n` bytes from an open binary file.
+    
+    Raises:
+        _TruncatedFrameError: if the end of file is reached before `n` bytes are read
+    """
+    data = f.read(n)
+    if len(data) != n:
+        raise _TruncatedFrameError
+    return data
+
+def _load_frame(f):
+    """
+    Loads one frame from an open binary file. Both frames written with _dump_frame() and
+    plain pickle frames (files saved with older versions) are supported.
+    
+    Args:
+        f (file): file opened in binary read mode
+        
+    Returns:
+        object: unpickled object
+        
+    Raises:
+        EOFError: if the end of file is reached
+        _TruncatedFrameError: if the file ends inside the frame
+    """
+    magic = f.read(len(_OOB_FRAME_MAGIC))
+    if magic != _OOB_FRAME_MAGIC:
+        if len(magic) == 0:
+            raise EOFError
+        f.seek(-len(magic), os.SEEK_CUR)
+        try:
+            return pickle.load(f)
+        except (EOFError, pickle.UnpicklingError):
+            raise _TruncatedFrameError
+    
+    stream_length = int.from_bytes(_read_exact(f, 8), "little")
+    n_buffers     = int.from_bytes(_read_exact(f, 8), "little")
+    stream = _read_exact(f, stream_length)
+    
+    buffers = []
+    for _ in range(n_buffers):
+        buffer = bytearray(int.from_bytes(_read_exact(f, 8), "little"))
+        if f.readinto(buffer) != len(buffer):
+            raise _TruncatedFrameError
+        buffers.append(buffer)
+        
+    return pickle.loads(stream, buffers=buffers)
+
 # open measurements:
 def load_measurement(name: str, directory: str = ''):
     """
-    Loads a measurement from a pickle file.
+    Loads a measurement from a pickle file. Files created with periodic saving contain multiple
+    pickle frames (one per save interval), these are combined into one measurement dictionary.
     
     Args:
         name (str): name of the measurement file
@@ -23,8 +232,87 @@ def load_measurement(name: str, directory: str = ''):
     else:
         file_path = os.path.join(directory, name)
         
+    frames = []
     with open(file_path, 'rb') as f:
-        return pickle.load(f)
+        while True:
+            try:
+                frames.append(_load_frame(f))
+            except EOFError:
+                break
+            except _TruncatedFrameError:
+                # only the last frame of an append-only file can be incomplete
+                if len(frames) == 0:
+                    raise EOFError(f"The measurement file '{file_path}' is incomplete and contains no complete data frame.")
+                print(f"Warning: the last data frame of '{file_path}' is incomplete (saving was interrupted) and was not loaded. "
+                      f"{len(frames)} complete frame(s) were loaded.")
+                break
+            
+    if len(frames) == 1:
+        return frames[0]
+    return _merge_measurements(frames)
+
+class _ChunkList:
+    """
+    Collects arrays (chunks) along the first axis. Appending a chunk is O(1), chunks are concatenated
+    only once, into a preallocated array, when the combined array is requested.
+    """
+    def __init__(self):
+        self.chunks = []
+        
+    def append(self, array):
+        """Adds array to the end of the list."""
+        self.chunks.append(array)
+        
+    def get(self):
+        """Returns all chunks concatenated along the first axis."""
+        if len(self.chunks) == 1:
+            return self.chunks[0]
+        
+        first = self.chunks[0]
+        n_rows = sum(chunk.shape[0] for chunk in self.chunks)
+        out = np.empty((n_rows, *first.shape[1:]), dtype=np.result_type(*self.chunks))
+        return np.concatenate(self.chunks, axis=0, out=out)
+
+def _merge_measurements(frames):
+    """
+    Combines measurement dictionaries (frames) into one measurement dictionary. Arrays of 
+    each source are collected first and concatenated only once at the end.
+    
+    Args:
+        frames (list): list of measurement dictionaries, ordered in time
+        
+    Returns:
+        measurement (dict): dictionary containing concatenated measurement data
+    """
+    measurement = {}
+    chunks = {}
+    for frame in frames:
+        for source, meas in frame.items():
+            if not isinstance(meas, dict): # e.g. comment
+                measurement[source] = meas
+                continue
+            
+            if source not in measurement:
+                measurement[source] = meas
+                chunks[source] = {key: _ChunkList() for key in ["time", "data"] if key in meas}
+                if "video" in meas: # videos are saved as arrays in list
+                    chunks[source]["video"] = [_ChunkList() for _ in meas["video"]]
+                    
+            for key in ["time", "data"]:
+                if key in meas:
+                    chunks[source][key].append(meas[key])
+            if "video" in meas:
+                for video_chunks, video in zip(chunks[source]["video"], meas["video"]):
+                    video_chunks.append(video)
+                        
+    for source, source_chunks in chunks.items():
+        for key, chunk_list in source_chunks.items():
+            if key == "video":
+                measurement[source][key] = [video_chunks.get() for video_chunks in chunk_list]
+            else:
+                measurement[source][key] = chunk_list.get()
+                
+    return measurement
     
 def load_measurement_multiple_files(directory: str = None, contains: str = ''):
     """
@@ -38,25 +326,13 @@ def load_measurement_multiple_files(directory: str = None, contains: str = ''):
     Returns:
         measurement (dict): dictionary containing concatenated measurement datra from multiple files.
     """
-    files = os.listdir(directory)
+    files = sorted(os.listdir(directory)) # file names start with timestamp and end with file index
     files = [file for file in files if contains in file]
-    measurement = {}
+    measurements = []
     for file in files:
         if directory is None:
-            meas = load_measurement(file)
+            measurements.append(load_measurement(file))
         else:
-            meas = load_measurement(os.path.join(directory , file))
-        for source in meas.keys():
-            if source not in measurement.keys():
-                measurement[source] = meas[source]
-            else: # we need to concatenate
-                for key in meas[source].keys():
-                    vals = meas[source][key]
-                    if key == "video": # videos are saved as arrays in list
-                        measurement[source][key] = [ np.concatenate((array, arr), axis=0) for array, arr 
-                                                    in zip(measurement[source][key], meas[source][key]) ]
+            measurements.append(load_measurement(os.path.join(directory , file)))
                         
-                    if key == "data" or key == "time": # data is saved 2D array
-                        measurement[source][key] = np.concatenate((measurement[source][key], meas[source][key]), axis=0)
-                        
-    return measurement
+    return _merge_measurements(measurements)
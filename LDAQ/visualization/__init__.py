@@ -1 +1,2 @@
-from .visualization import Visualization
\ No newline at end of file
+from .visualization import Visualization
+from .visualization_helpers import rfft_amplitude
\ No newline at end of file
@@ -12,14 +12,14 @@ import os
 import random
 import time
 import types
-import keyboard
-from pyTrigger import RingBuffer2D
+from concurrent.futures import ThreadPoolExecutor
 
 from typing import Optional, Tuple, Union, List, Callable
 
-from .visualization_helpers import compute_nth, check_subplot_options_validity, _fun_fft, _fun_frf_amp, _fun_frf_phase, _fun_coh
+from .visualization_helpers import compute_nth, check_subplot_options_validity, PlotRingBuffer2D, points_within_xlim, _compile_kernels, _fun_fft, _fun_frf_amp, _fun_frf_phase, _fun_coh
 
 INBUILT_FUNCTIONS = {'fft': _fun_fft, 'frf_amp': _fun_frf_amp, 'frf_phase': _fun_frf_phase, 'coh': _fun_coh}
+_IDENTITY = object() # used instead of a plot function if the data is plotted as it is
 
 # Create a subclass of ImageView
 class HoverImageView(pg.ImageView):
@@ -47,6 +47,9 @@ class HoverImageView(pg.ImageView):
         # Save the last hover position
         self.last_hover_pos = None
 
+        # Every `downsample`-th pixel of the image is shown
+        self.downsample = 1
+
         # Enable mouse tracking to receive hover events
         self.getImageItem().hoverEvent = self.hoverEvent
         self.setMouseTracking(True)
@@ -78,7 +81,7 @@ class HoverImageView(pg.ImageView):
                 
             if 0 <= x < image.shape[0] and 0 <= y < image.shape[1]:
                 value = image[x, y]
-                self.pixel_label.setText(f'x:{x:4}, y:{y:4}\nvalue: {value:4}')
+                self.pixel_label.setText(f'x:{x*self.downsample:4}, y:{y*self.downsample:4}\nvalue: {value:4}')
                 
                 # Adjust the position to ensure pixel_label is within ImageView
                 label_width = self.pixel_label.width()
@@ -98,8 +101,48 @@ class HoverImageView(pg.ImageView):
             self.pixel_label.move(10, 10)
 
 
+class _PlotChannel:
+    """
+    A line or an image of the running visualization. Created from the plot dictionaries in `Visualization.plots` 
+    when the visualization is started, attributes are used instead of dictionary keys in the refresh loop.
+    """
+    __slots__ = ('pos', 'channels', 'apply_function', 'is_identity', 'nth', 'since_refresh', 'refresh_rate', 't_span', 
+                 'color_map', 'line', 'image_view', 'boxstate', 'sample_rate', 't_span_samples', 'xlim_lo', 'xlim_hi', 
+                 'x_time', 'x_cached', 'xlim_slice', 'x_buffer', 'y_buffer', 'x_monotonic', 'last_written', 'run_in_thread', 'update_fn')
+
+    def __init__(self, pos, channels, apply_function, is_identity, nth, since_refresh, refresh_rate, t_span=None, color_map=None):
+        self.pos = pos
+        self.channels = channels
+        self.apply_function = apply_function
+        self.is_identity = is_identity
+        self.nth = nth
+        self.since_refresh = since_refresh
+        self.refresh_rate = refresh_rate
+        self.t_span = t_span
+        self.color_map = color_map
+
+        # set in MainWindow.init_plots():
+        self.line = None
+        self.image_view = None
+        self.boxstate = False
+        self.sample_rate = None
+        self.t_span_samples = None
+        self.xlim_lo = None
+        self.xlim_hi = None
+        self.x_time = None
+        self.x_cached = None
+        self.xlim_slice = None
+        self.x_buffer = None
+        self.y_buffer = None
+        self.last_written = -1 # number of rows written to the ring buffer at the last redraw
+        self.run_in_thread = apply_function in INBUILT_FUNCTIONS.values() # inbuilt functions only depend on the acquisition
+        self.x_monotonic = self.run_in_thread # the x-axes (frequency) of inbuilt functions are sorted, of user functions unknown
+        self.update_fn = None # MainWindow method that redraws the line
+
+
 class Visualization:
-    def __init__(self, refresh_rate: int = 100, max_points_to_refresh: int = 10000, sequential_plot_updates: bool = False):
+    def __init__(self, refresh_rate: int = 100, max_points_to_refresh: int = 10000, sequential_plot_updates: bool = False,
+                 use_opengl: bool = False):
         """Initialize a new `Visualization` object.
 
         Args:
@@ -107,7 +150,10 @@ class Visualization:
             max_points_to_refresh (int, optional): The maximum number of points to refresh in the plot. Adjust this number to optimize performance.
                 This number is used to compute the `nth` value automatically. Defaults to 10000.
             sequential_plot_updates (bool, optional): If `True`, the plot is updated sequentially (one line at a time).
-                If `False`, all lines are updated in each iteration of the main loop. Defaults to `True`.
+                If `False`, all lines are updated in each iteration of the main loop. Sequential updates are only used 
+                if more than 8 lines are plotted. Defaults to `False`.
+            use_opengl (bool, optional): If `True`, the lines are rendered with OpenGL (requires PyOpenGL). The pyqtgraph
+                options are restored when the window is closed. Defaults to `False`.
 
         """
         self.max_plot_time = 1
@@ -121,6 +167,7 @@ class Visualization:
         self.update_refresh_rate = 10 # [ms] interval of calling the plot_update function
         self.max_points_to_refresh = max_points_to_refresh
         self.sequential_plot_updates = sequential_plot_updates
+        self.use_opengl = use_opengl
     
 
     def add_lines(self, position: Tuple[int, int], source: str, channels: Union[int, str, tuple, list],
@@ -189,13 +236,22 @@ class Visualization:
         The ``channel_data`` argument is a list of numpy arrays, where each array corresponds to the data from one channel. 
         The data is acquired in the order specified in the ``channels`` argument.
 
+        The ``channel_data`` can be a view of the plotting buffer and must not be modified in-place.
+
+        For spectra in custom functions, ``rfft_amplitude`` from ``LDAQ.visualization`` can be used:
+
+        >>> def function(self, channel_data):
+                return LDAQ.visualization.rfft_amplitude(channel_data, self.acquisition.sample_rate)
+
         For the example above, the custom function is called for each channel separetely, the ``channel_data`` is a one-dimensional numpy array. 
         To add mutiple channels to the ``channel_data`` argument, the ``channels`` argument is modified as follows:
 
         >>> vis.add_lines(position=(0, 0), source='DataSource', channels=[(0, 1)], function=function)
 
         The ``function`` is now passed the ``channel_data`` with shape ``(N, 2)`` where ``N`` is the number of samples.
-        The function can also return a 2D numpy array with shape ``(N, 2)`` where the first column is the x-axis and the second column is the y-axis.
+        The function can also return a tuple ``(x, y)`` of 1D numpy arrays, where ``x`` is the x-axis and ``y`` is the y-axis.
+        A 2D numpy array with shape ``(N, 2)`` where the first column is the x-axis and the second column is the y-axis is also accepted, 
+        but the tuple avoids stacking and splitting the columns.
         An example of such a function is:
 
         >>> def function(self, channel_data):
@@ -204,12 +260,12 @@ class Visualization:
                     self: instance of the acquisition object (has to be there so the function is called properly)
                     channel_data (np.ndarray): A 2D channel data array of size (N, 2).
                 Returns:
-                    np.ndarray: A 2D array np.array([x, y]).T that will be plotted on the subplot.
+                    tuple: x and y arrays that will be plotted on the subplot.
                 '''
                 ch0, ch1 = channel_data.T
                 x =  np.arange(len(ch1)) / self.acquisition.sample_rate # time array
                 y = ch1**2 + ch0 - 10
-                return np.array([x, y]).T
+                return x, y
         """
         self.add_line_widget = True
 
@@ -240,7 +296,7 @@ class Visualization:
         elif function in INBUILT_FUNCTIONS.keys():
             apply_function = INBUILT_FUNCTIONS[function]
         else:
-            apply_function = lambda x, y: y
+            apply_function = _IDENTITY
 
         if refresh_rate:
             plot_refresh_rate = self.update_refresh_rate*(refresh_rate//self.update_refresh_rate)
@@ -252,6 +308,7 @@ class Visualization:
                 'pos': position,
                 'channels': channel,
                 'apply_function': apply_function,
+                'is_identity': apply_function is _IDENTITY,
                 'nth': nth,
                 'since_refresh': 1e40,
                 'refresh_rate': plot_refresh_rate,
@@ -296,13 +353,14 @@ class Visualization:
         elif function in INBUILT_FUNCTIONS.keys():
             apply_function = INBUILT_FUNCTIONS[function]
         else:
-            apply_function = lambda x, y: y
+            apply_function = _IDENTITY
         
 
         self.plots[source].append({
             'pos': 'image',
             'channels': channel,
             'apply_function': apply_function,
+            'is_identity': apply_function is _IDENTITY,
             'nth': 1,
             'since_refresh': 1e40,
             'refresh_rate': refresh_rate,
@@ -353,8 +411,11 @@ class Visualization:
 
 
     def check(self):
-        self.positions = list(set([plot['pos'] for plot in [plot for plots in self.plots.values() for plot in plots]]))[::-1]
-        self.positions = [_ for _ in self.positions if _ != 'image']
+        positions = {} # dictionary keeps unique positions in the order they were added
+        for plots in self.plots.values():
+            for plot in plots:
+                positions.setdefault(plot['pos'], None)
+        self.positions = [pos for pos in positions if pos != 'image'][::-1]
 
         # Make sure that all subplots have options defined.
         for pos in self.positions:
@@ -365,9 +426,14 @@ class Visualization:
         self._check_added_lines()
         self._check_channels()
 
+        # plot channels used by the MainWindow, `self.plots` is left unchanged for the next run
+        self._plot_channels = {source: [_PlotChannel(**plot_channel) for plot_channel in plot_channels] 
+                               for source, plot_channels in self.plots.items()}
+
     
     def run(self, core):
         self.core = core
+        self._source_to_acq = dict(zip(self.core.acquisition_names, self.core.acquisitions))
         # self.core.is_running_global = False
 
         self.check()
@@ -393,7 +459,7 @@ class Visualization:
         If the `pos` is not 'image', check that the `channel` is a string or an intiger. If it is a string, convert it to an intiger.
         """
         for source, plot_channels in self.plots.items():
-            acq_index = self.core.acquisition_names.index(source)
+            acq = self._source_to_acq[source]
             for i, plot_channel in enumerate(plot_channels):
                 if plot_channel['pos'] == 'image':
                     if type(plot_channel['channels']) == str:
@@ -405,13 +471,13 @@ class Visualization:
                 else:
                     if type(plot_channel['channels']) == str:
                         channel = plot_channel['channels']
-                        self.plots[source][i]['channels'] = self.core.acquisitions[acq_index].channel_names.index(channel)
+                        self.plots[source][i]['channels'] = acq.channel_names.index(channel)
                     elif type(plot_channel['channels']) == int:
                         pass
                     elif type(plot_channel['channels']) == tuple:
                         channel1, channel2 = plot_channel['channels']
-                        channel1 = self.core.acquisitions[acq_index].channel_names.index(channel1) if type(channel1)==str else channel1
-                        channel2 = self.core.acquisitions[acq_index].channel_names.index(channel2) if type(channel2)==str else channel2
+                        channel1 = acq.channel_names.index(channel1) if type(channel1)==str else channel1
+                        channel2 = acq.channel_names.index(channel2) if type(channel2)==str else channel2
                         self.plots[source][i]['channels'] = (channel1, channel2)
                     else:
                         raise ValueError("The `channel` must be a string (`channel_name`), intiger (`channel_index`) or tuple of two strings or intigers.")
@@ -426,13 +492,14 @@ class Visualization:
         if hasattr(self, "core"):
             # Determine the nth value for each line.
             for source, plot_channels in self.plots.items():
-                acq_index = self.core.acquisition_names.index(source)
-                sample_rate = self.core.acquisitions[acq_index].sample_rate
+                sample_rate = self._source_to_acq[source].sample_rate
                 for i, plot_channel in enumerate(plot_channels):
                     if plot_channel['nth'] == 'auto':
                         t_span = plot_channel['t_span']
                         self.plots[source][i]['nth'] = compute_nth(self.max_points_to_refresh, t_span, n_lines, sample_rate)
 
+        _compile_kernels(fft=any(plot_channel['apply_function'] is _fun_fft for plot_channels in self.plots.values() for plot_channel in plot_channels))
+
 
     def _check_t_span_and_xlim(self):
         """Check and set the `t_span` and `xlim` options for all plots in `self.plots`.
@@ -469,28 +536,35 @@ class Visualization:
     def create_ring_buffers(self):
         """Create and initialize the ring buffers for all plots in `self.plots`.
 
-        For each source in `self.plots`, this method creates a `RingBuffer2D` object with the appropriate number of rows
+        For each source in `self.plots`, this method creates a `PlotRingBuffer2D` object with the appropriate number of rows
         and channels, based on the `t_span` and `sample_rate` options in `self.plots` and the corresponding acquisition.
         If the acquisition has video channels, this method also initializes a list of random images for each video channel.
-        If a source does not have any channels, a `RingBuffer2D` object with one row and one channel is created.
+        If a source does not have any channels, a `PlotRingBuffer2D` object with one row and one channel is created.
 
         This method modifies the `ring_buffers` and `new_images` attributes of the `Visualization` object in-place.
         """
         self.ring_buffers = {}
         for source in self.plots.keys():
-            acq = self.core.acquisitions[self.core.acquisition_names.index(source)]
+            acq = self._source_to_acq[source]
             if acq.channel_names:
                 n_channels = len(acq.channel_names)
                 # rows = int(max([self.subplot_options[pos]['t_span'] * acq.sample_rate for pos in self.positions]))
                 rows = int(max([_['t_span'] * acq.sample_rate for _ in self.plots[source] if _['pos'] != 'image']))
-                self.ring_buffers[source] = RingBuffer2D(rows, n_channels)
+                self.ring_buffers[source] = PlotRingBuffer2D(rows, n_channels)
             
             if acq.channel_names_video:
                 # self.new_images = [np.random.rand(10, 10)] * len(acq.channel_names_video)
                 self.new_images = [(ch, np.random.rand(10, 10)) for ch in acq.channel_names_video]
 
             if source not in self.ring_buffers.keys():
-                self.ring_buffers[source] = RingBuffer2D(1, 1)
+                self.ring_buffers[source] = PlotRingBuffer2D(1, 1)
+
+        # Sources are resolved once, the refresh loop only iterates over this list.
+        self._source_acq_pairs = []
+        for source in self.plots.keys():
+            acq = self._source_to_acq[source]
+            self._source_acq_pairs.append((source, acq, self.ring_buffers[source], bool(acq.channel_names_video), bool(acq.channel_names), 
+                                           self._plot_channels[source]))
 
 
 class MainWindow(QMainWindow):
@@ -510,6 +584,15 @@ class MainWindow(QMainWindow):
         self.measurement_stopped = False
         self.freeze_plot = False
 
+        # inbuilt plot functions (fft, frf, coh) are computed in a worker thread, see apply_function()
+        self.function_pool = ThreadPoolExecutor(max_workers=1)
+        self.function_futures = {} # (future, rows written to the buffer when submitted)
+        self.results_pending = False
+
+        # background of the window while the measurement is running, set in on_measurement_start()
+        self.palette_running = self.palette()
+        self.palette_running.setColor(self.backgroundRole(), QColor(152, 251, 177))
+
         self.setWindowTitle('Data Acquisition and Visualization')
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -613,11 +696,13 @@ class MainWindow(QMainWindow):
     
     def init_plots(self):
         # Compute the update refresh rate
-        n_lines = sum([len(plot_channels) for plot_channels in self.vis.plots.values()])
-        minimum_refresh_rate = int(min(list(set([plot['refresh_rate'] for plot in [plot for plots in self.vis.plots.values() for plot in plots]]))))
+        refresh_rates = [plot_channel.refresh_rate for plot_channels in self.vis._plot_channels.values() for plot_channel in plot_channels]
+        n_lines = len(refresh_rates)
+        minimum_refresh_rate = int(min(refresh_rates))
         
-        # Compute the max number of plots per refresh (if sequential plot updates are enabled)
-        if self.vis.sequential_plot_updates:
+        # Compute the max number of plots per refresh (if sequential plot updates are enabled).
+        # Sequential updates only pay off for many lines, with a few lines all are updated in each refresh.
+        if self.vis.sequential_plot_updates and n_lines > 8:
             # Max number of plots per refresh is computed
             computed_update_refresh_rate = max(10, min(500, int(minimum_refresh_rate/(n_lines+1))))
             self.vis.max_plots_per_refresh = int(np.ceil((n_lines * computed_update_refresh_rate) / minimum_refresh_rate))
@@ -626,10 +711,24 @@ class MainWindow(QMainWindow):
             self.vis.max_plots_per_refresh = 1e40
             self.vis.update_refresh_rate = minimum_refresh_rate
 
+        # While no new data is available, the timer is slowed down to this interval [ms]:
+        # four times the update interval, between 200 and 500 ms, but never faster than the update interval.
+        self.max_timer_interval = max(self.vis.update_refresh_rate, 200, min(500, 4*self.vis.update_refresh_rate))
+
 
         pg.setConfigOption('background', 'w')
         pg.setConfigOption('foreground', 'k')
 
+        # Render lines with OpenGL if requested and PyOpenGL is installed, the global options are restored in close_app.
+        self.previous_config_options = None
+        if self.vis.use_opengl:
+            try:
+                import OpenGL
+                self.previous_config_options = {option: pg.getConfigOption(option) for option in ('useOpenGL', 'enableExperimental')}
+                pg.setConfigOptions(useOpenGL=True, enableExperimental=True)
+            except ImportError:
+                print("PyOpenGL is not installed, the lines are rendered without OpenGL.")
+
         self.time_start = time.time()
         grid_layout = pg.GraphicsLayoutWidget()
 
@@ -685,24 +784,23 @@ class MainWindow(QMainWindow):
                 
         # Create lines for each plot channel
         images = 0
-        for source, plot_channels in self.vis.plots.items():
-            channel_names = self.core.acquisitions[self.core.acquisition_names.index(source)].channel_names
+        x_axes = {}
+        for source, plot_channels in self.vis._plot_channels.items():
+            acq = self.vis._source_to_acq[source]
+            channel_names = acq.channel_names
             color_dict.update({ch: ind+len(color_dict) for ind, ch in enumerate(channel_names)})
 
-            for i, plot_channel in enumerate(plot_channels):
-                pos = plot_channel['pos']
-                ch = plot_channel['channels']
+            for plot_channel in plot_channels:
+                pos = plot_channel.pos
+                ch = plot_channel.channels
 
                 if pos == 'image':
                     images += 1
-                    if "boxstate" in plot_channel.keys():
-                        # remove the key
-                        plot_channel.pop("boxstate")
 
-                    if plot_channel['color_map'] == 'CET-L17':
-                        cm = pg.colormap.get(plot_channel['color_map'])
+                    if plot_channel.color_map == 'CET-L17':
+                        cm = pg.colormap.get(plot_channel.color_map)
                     else:
-                        cm = pg.colormap.getFromMatplotlib(plot_channel['color_map'])
+                        cm = pg.colormap.getFromMatplotlib(plot_channel.color_map)
 
                     if cm.color[0, 0] == 1:
                         cm.reverse()
@@ -719,16 +817,60 @@ class MainWindow(QMainWindow):
                     image_view.ui.histogram.hide()
                     image_view.ui.roiBtn.hide()
                     image_view.ui.menuBtn.hide()
-                    self.vis.plots[source][i]['image_view'] = image_view
+                    plot_channel.image_view = image_view
                 else:
+                    # The finite check of setData is kept, virtual channels and some sources can produce NaN values.
+                    line_options = dict(antialias=False)
                     if isinstance(ch, tuple):
                         x, y = ch
-                        line = self.subplots[pos].plot(pen=pg.mkPen(color=color_dict[channel_names[y]], width=2), name=f"{channel_names[x]} vs. {channel_names[y]}")
-                        self.vis.plots[source][i]['line'] = line
+                        line = self.subplots[pos].plot(pen=pg.mkPen(color=color_dict[channel_names[y]], width=2), name=f"{channel_names[x]} vs. {channel_names[y]}", **line_options)
+                        plot_channel.line = line
 
                     elif isinstance(ch, int):
-                        line = self.subplots[pos].plot(pen=pg.mkPen(color=color_dict[channel_names[ch]], width=2), name=f"{channel_names[ch]}")
-                        self.vis.plots[source][i]['line'] = line
+                        line = self.subplots[pos].plot(pen=pg.mkPen(color=color_dict[channel_names[ch]], width=2), name=f"{channel_names[ch]}", **line_options)
+                        plot_channel.line = line
+
+                    # Cache the rendered curve between repaints that do not change its data.
+                    plot_channel.line.curve.setCacheMode(pg.QtWidgets.QGraphicsItem.DeviceCoordinateCache)
+
+                    # Values used in every refresh are computed only once.
+                    plot_channel.sample_rate = acq.sample_rate
+                    plot_channel.t_span_samples = int(plot_channel.t_span * acq.sample_rate)
+                    plot_channel.xlim_lo, plot_channel.xlim_hi = self.vis.subplot_options[pos]['xlim']
+
+                    # The update method is chosen once for the type of the line.
+                    if isinstance(ch, int):
+                        plot_channel.update_fn = self.update_time_line if plot_channel.is_identity else self.update_function_line
+
+                        # Time lines are peak-decimated in update_time_line(), pyqtgraph only draws the visible part when zoomed in.
+                        # Long function results (e.g. spectra) are peak-decimated by pyqtgraph to the width of the plot.
+                        if plot_channel.is_identity:
+                            plot_channel.line.setClipToView(True)
+                        else:
+                            plot_channel.line.setDownsampling(auto=True, method='peak')
+                    else:
+                        plot_channel.update_fn = self.update_xy_line if plot_channel.is_identity else self.update_function_xy_line
+
+                    if isinstance(ch, int):
+                        # Time axis of the decimated data is the same for every refresh and shared between lines.
+                        key = (acq.sample_rate, plot_channel.t_span_samples, plot_channel.nth)
+                        if key not in x_axes:
+                            x_axes[key] = (np.arange(0, plot_channel.t_span_samples, plot_channel.nth) / acq.sample_rate).astype(np.float32)
+                        plot_channel.x_time = x_axes[key]
+
+                    if isinstance(ch, int) and plot_channel.is_identity:
+                        # Only the part within xlim is plotted.
+                        i0 = np.searchsorted(plot_channel.x_time, plot_channel.xlim_lo, side='left')
+                        i1 = np.searchsorted(plot_channel.x_time, plot_channel.xlim_hi, side='right')
+                        plot_channel.x_cached = plot_channel.x_time[i0:i1]
+                        plot_channel.xlim_slice = slice(i0, i1)
+                        plot_channel.y_buffer = np.empty(i1 - i0, dtype=np.float32) # reused in every refresh
+
+                    elif isinstance(ch, tuple) and plot_channel.is_identity:
+                        # Both channels are decimated into separate contiguous arrays, reused in every refresh.
+                        n_points = len(range(0, plot_channel.t_span_samples, plot_channel.nth))
+                        plot_channel.x_buffer = np.empty(n_points, dtype=np.float32)
+                        plot_channel.y_buffer = np.empty(n_points, dtype=np.float32)
 
                     # Add legend to the subplot
                     if pos not in self.legends.keys() and pos != 'image':
@@ -738,30 +880,50 @@ class MainWindow(QMainWindow):
                                 legend.addItem(item, item.opts['name'])
                         self.legends[pos] = legend
 
-        self.plots = self.vis.plots
+        self.plots = self.vis._plot_channels
         
 
     def init_timer(self):
+        self.skipped_time = 0 # [ms] time of refreshes skipped because no new data was available
+        self.timer_interval = self.vis.update_refresh_rate # [ms] current interval of the timer
         self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
         self.timer.timeout.connect(self.update_plots)
-        self.timer.start(self.vis.update_refresh_rate)
+        self.timer.start(self.timer_interval)
+
+
+    def set_timer_interval(self, interval):
+        """Changes the interval of the timer, the refresh times are counted with `self.timer_interval`."""
+        if interval != self.timer_interval:
+            self.timer_interval = interval
+            self.timer.setInterval(interval)
 
 
     def update_ring_buffers(self):
-        for source, buffer in self.vis.ring_buffers.items():
-            acq = self.core.acquisitions[self.core.acquisition_names.index(source)]
-            if acq.channel_names_video:
-                plot_channel = self.plots[source][-1]
-                since_refresh = plot_channel['since_refresh']
-                refresh_rate = plot_channel['refresh_rate']
-                if (refresh_rate <= since_refresh + self.vis.update_refresh_rate):
+        """Reads new data from the acquisitions.
+
+        Returns:
+            bool: True if any new data or image was read.
+        """
+        new_data_read = False
+        for source, acq, buffer, has_video, has_data, plot_channels in self.vis._source_acq_pairs:
+            if has_video:
+                plot_channel = plot_channels[-1]
+                since_refresh = plot_channel.since_refresh
+                refresh_rate = plot_channel.refresh_rate
+                if (refresh_rate <= since_refresh + self.timer_interval + self.skipped_time):
                     _, new_data = acq.get_data(N_points=1, data_to_return="video")
                     # self.new_images = [_[-1].T for _ in new_data]
                     self.new_images = dict([(ch, _[-1].T) for ch, _ in zip(acq.channel_names_video, new_data)])
+                    new_data_read = True
 
-            if acq.channel_names:
+            if has_data:
+                n_written = buffer.n_written
                 new_data = acq.get_data_PLOT()
                 buffer.extend(new_data)
+                new_data_read = new_data_read or buffer.n_written != n_written
+
+        return new_data_read
 
 
     def update_plots(self, force_refresh=False):
@@ -789,92 +951,222 @@ class MainWindow(QMainWindow):
                 string = "Duration: Until stopped"
             self.label.setText(string) 
 
-        # Update the ring buffers.
-        self.update_ring_buffers()
-
-        if not self.freeze_plot:
-            updated_plots = 0
-            for source, plot_channels in self.plots.items():
-                self.vis.acquisition = self.core.acquisitions[self.core.acquisition_names.index(source)]
-
-                # for line, pos, apply_function, *channels in plot_channels:
-                for i, plot_channel in enumerate(plot_channels):
-                    refresh_rate = plot_channel['refresh_rate']
-                    since_refresh = plot_channel['since_refresh']
-
-                    if (refresh_rate <= since_refresh + self.vis.update_refresh_rate or force_refresh) and updated_plots < self.vis.max_plots_per_refresh:
-                        # If time to refresh, refresh the plot and set since_refresh to 0.
-                        plot_channel['since_refresh'] = 0
-                        
-                        if plot_channel['pos'] == 'image':
-                            if hasattr(self, 'new_images'):
-                                new_data = self.new_images[plot_channel['channels']]
-                                #print(new_data.shape)
-                                self.update_image(new_data, plot_channel)
-                        else:
-                            new_data = self.vis.ring_buffers[source].get_data()
-                            self.update_line(new_data, plot_channel)
+        # Update the ring buffers. While the plot is frozen, the data is still read, so that the (possibly short)
+        # ring buffers of the acquisitions do not overrun, only the plots are not redrawn.
+        new_data_read = self.update_ring_buffers()
 
-                        updated_plots += 1
-                    else:
-                        # If not time to refresh, increase since_refresh by update_refresh_rate.
-                        plot_channel['since_refresh'] += self.vis.update_refresh_rate
+        if self.freeze_plot:
+            return
+
+        # Skip the refresh if no source has new data and all lines show the last data and results of the worker thread, 
+        # the skipped time is added to the next refresh.
+        timer_interval = self.timer_interval
+        if not new_data_read and not force_refresh and not self.results_pending and not self.lines_outdated():
+            self.skipped_time += timer_interval
+            # Poll less often while the acquisitions are idle.
+            self.set_timer_interval(min(2*timer_interval, self.max_timer_interval))
+            return
+        self.set_timer_interval(self.vis.update_refresh_rate)
+        self.results_pending = False
+        elapsed_time = timer_interval + self.skipped_time
+        self.skipped_time = 0
+
+        updated_plots = 0
+        max_plots_per_refresh = self.vis.max_plots_per_refresh
+        self.function_results = {} # results of plot functions in this refresh, see apply_function()
+        self.x_results = {} # masked x-axes of channel vs. channel lines in this refresh, see update_xy_line()
+        vis = self.vis
+        for source, acq, buffer, _, _, plot_channels in vis._source_acq_pairs:
+            vis.acquisition = acq
+
+            for plot_channel in plot_channels:
+                if (plot_channel.refresh_rate <= plot_channel.since_refresh + elapsed_time or force_refresh) and updated_plots < max_plots_per_refresh:
+                    # If time to refresh, refresh the plot and set since_refresh to 0.
+                    plot_channel.since_refresh = 0
+                    
+                    if plot_channel.pos == 'image':
+                        if hasattr(self, 'new_images'):
+                            new_data = self.new_images[plot_channel.channels]
+                            #print(new_data.shape)
+                            self.update_image(new_data, plot_channel)
+                    elif buffer.n_written != plot_channel.last_written or force_refresh:
+                        # Lines are only redrawn if new data was added to the buffer.
+                        plot_channel.last_written = buffer.n_written
+                        plot_channel.update_fn(buffer, plot_channel, force_refresh)
+
+                    updated_plots += 1
+                else:
+                    # If not time to refresh, increase since_refresh by the time since the last refresh.
+                    plot_channel.since_refresh += elapsed_time
     
     
+    def lines_outdated(self):
+        """Checks if any line is not drawn with the last data in the buffer of its source, e.g. because its
+        refresh was not due yet or its result of the worker thread is not displayed yet.
+
+        Returns:
+            bool: True if any line is outdated.
+        """
+        for source, acq, buffer, has_video, has_data, plot_channels in self.vis._source_acq_pairs:
+            if has_data:
+                for plot_channel in plot_channels:
+                    if plot_channel.pos != 'image' and plot_channel.last_written != buffer.n_written:
+                        return True
+        return False
+
+
     def update_image(self, new_data, plot_channel):
-        _view = plot_channel['image_view'].getView()
-        if 'boxstate' in plot_channel.keys():
+        image_view = plot_channel.image_view
+        _view = image_view.getView()
+        if plot_channel.boxstate:
             _state = _view.getState()
 
-        plot_channel['image_view'].setImage(new_data)
+        # Images larger than the widget are strided, only every k-th pixel is passed to the image item.
+        # The strided image is scaled by k, so it covers the original pixel coordinates and the view state stays valid.
+        k = max(1, max(new_data.shape[:2]) // max(1, image_view.width(), image_view.height()))
+        image_view.setImage(new_data[::k, ::k], scale=(k, k))
 
-        if 'boxstate' in plot_channel.keys():
+        if plot_channel.boxstate:
             _view.setState(_state)
         
-        plot_channel['boxstate'] = True
-
+        plot_channel.boxstate = True
 
-    def update_line(self, new_data, plot_channel):
-        # only plot data that are within xlim (applies only for normal plot, not ch vs. ch)
-        t_span_samples = int(plot_channel['t_span'] * self.vis.acquisition.sample_rate)
-        
-        nth = plot_channel['nth']
 
-        xlim = self.vis.subplot_options[plot_channel['pos']]['xlim']
+    def apply_function(self, buffer, plot_channel, force_refresh=False):
+        """Applies the plot function of the line to its data. Within one refresh, the result is reused 
+        by lines that apply the same function to the same channels and time span of the same source.
 
-        if isinstance(plot_channel['channels'], int):
-            # plot a single channel
-            ch = plot_channel['channels']
-            fun_return = plot_channel['apply_function'](self.vis, new_data[-t_span_samples:, ch])
+        Inbuilt functions are computed in a worker thread: the result of the previous call is returned 
+        and the function is called again with a copy of the current data, unless no rows were added to 
+        the buffer since the previous call. None is returned while the first result is not ready yet. 
+        While a submitted call is not displayed, the line is redrawn in the following refreshes. 
+        If `force_refresh` is True, the function is computed directly.
 
-            if len(fun_return.shape) == 1: 
-                # if function returns only 1D array
-                y = fun_return[::nth]
-                x = (np.arange(t_span_samples) / self.vis.acquisition.sample_rate)[::nth]
+        Args:
+            buffer (PlotRingBuffer2D): ring buffer of the source
+            plot_channel (_PlotChannel): plotted line
+            force_refresh (bool): compute the function in this thread. Defaults to False.
 
-            elif len(fun_return.shape) == 2 and fun_return.shape[1] == 2:  
-                # function returns 2D array (e.g. fft returns freq and amplitude)
-                # In this case, the first column is the x-axis and the second column is the y-axis.
-                # The nth argument is not used in this case.
-                x, y = fun_return.T # expects 2D array to be returned
+        Returns:
+            np.ndarray, None: result of the plot function
+        """
+        key = (id(buffer), plot_channel.channels, plot_channel.t_span_samples, plot_channel.apply_function)
+        if key in self.function_results:
+            fun_return, pending = self.function_results[key]
+        elif plot_channel.run_in_thread and not force_refresh:
+            future, n_written = self.function_futures.get(key, (None, -1))
+            fun_return = None
+            pending = True # the result of the submitted call is not displayed yet
+            if future is None or future.done():
+                if future is not None:
+                    fun_return = future.result()
+                pending = n_written != buffer.n_written
+                if pending:
+                    # The buffer is overwritten in place and `self.vis.acquisition` changes, both are fixed for the worker.
+                    data = buffer.get_tail(plot_channel.t_span_samples, plot_channel.channels)
+                    context = types.SimpleNamespace(acquisition=self.vis.acquisition)
+                    future = self.function_pool.submit(plot_channel.apply_function, context, np.array(data))
+                    self.function_futures[key] = (future, buffer.n_written)
+            self.function_results[key] = (fun_return, pending)
+        else:
+            data = buffer.get_tail(plot_channel.t_span_samples, plot_channel.channels)
+            fun_return = plot_channel.apply_function(self.vis, data)
+            pending = False
+            self.function_results[key] = (fun_return, pending)
+
+        if pending:
+            self.results_pending = True # do not skip the next refresh, see update_plots()
+            plot_channel.last_written = -1 # redraw the line when the result is ready
+        return fun_return
+
+
+    def update_time_line(self, buffer, plot_channel, force_refresh=False):
+        """Time-domain line of a single channel: peak-decimate first, the x-axis is precomputed in init_plots()."""
+        y = buffer.get_tail_peak(plot_channel.t_span_samples, plot_channel.channels, plot_channel.nth, 
+                                 plot_channel.xlim_slice.start, plot_channel.y_buffer)
+        plot_channel.line.setData(plot_channel.x_cached, y)
+
+    def update_function_line(self, buffer, plot_channel, force_refresh=False):
+        """Line of a single channel processed by the plot function. Only data within xlim is plotted."""
+        fun_return = self.apply_function(buffer, plot_channel, force_refresh)
+        if fun_return is None:
+            return
+
+        if isinstance(fun_return, tuple):
+            # function returns x and y (e.g. fft returns freq and amplitude)
+            # The nth argument is not used in this case.
+            x, y = fun_return
+            x_sorted = plot_channel.x_monotonic
+
+        elif len(fun_return.shape) == 1: 
+            # if function returns only 1D array
+            y = fun_return[::plot_channel.nth]
+            x = plot_channel.x_time
+            x_sorted = True
+
+        elif len(fun_return.shape) == 2 and fun_return.shape[1] == 2:  
+            # function returns 2D array, the first column is the x-axis and the second column is the y-axis.
+            # The nth argument is not used in this case.
+            x = np.ascontiguousarray(fun_return[:, 0])
+            y = np.ascontiguousarray(fun_return[:, 1])
+            x_sorted = plot_channel.x_monotonic
 
-            else:
-                raise Exception("Function used in `layout` must return either 1D array or 2D array with 2 columns.")
-            
-            mask = (x >= xlim[0]) & (x <= xlim[1]) # Remove data outside of xlim
-            
-            plot_channel['line'].setData(x[mask], y[mask])
+        else:
+            raise Exception("Function used in `layout` must return either 1D array, (x, y) tuple or 2D array with 2 columns.")
 
-        elif isinstance(plot_channel['channels'], tuple): 
-            # channel vs. channel
-            fun_return = plot_channel['apply_function'](self.vis, new_data[-t_span_samples:, plot_channel['channels']])
-            x, y = fun_return.T
-            mask = (x >= xlim[0]) & (x <= xlim[1]) # Remove data outside of xlim
-            
-            plot_channel['line'].setData(x[mask][::nth], y[mask][::nth])
+        # the plotted data is float32, double precision is kept in the acquisition
+        x = x.astype(np.float32, copy=False)
+        y = y.astype(np.float32, copy=False)
 
+        if x_sorted:
+            # Sorted x-axis (time, frequency): data within xlim is a contiguous slice
+            i0 = np.searchsorted(x, plot_channel.xlim_lo, side='left')
+            i1 = np.searchsorted(x, plot_channel.xlim_hi, side='right')
+            plot_channel.line.setData(x[i0:i1], y[i0:i1])
         else:
-            raise Exception("A single channel or channel vs. channel plot can be plotted at a time. Got more than 2 channels.")
+            self.plot_within_xlim(plot_channel, x, y)
+
+    def update_xy_line(self, buffer, plot_channel, force_refresh=False):
+        """Channel vs. channel line: decimate first, the mask is computed only for the plotted points.
+        Lines with the same x channel, time span and xlim share the x-axis and the mask."""
+        t_span_samples = plot_channel.t_span_samples
+        nth = plot_channel.nth
+        ch_x, ch_y = plot_channel.channels
+
+        key = (id(buffer), ch_x, t_span_samples, nth, plot_channel.xlim_lo, plot_channel.xlim_hi)
+        x_result = self.x_results.get(key)
+        if x_result is None:
+            x = buffer.get_tail_decimated(t_span_samples, ch_x, nth, 0, plot_channel.x_buffer)
+            mask = (x >= plot_channel.xlim_lo) & (x <= plot_channel.xlim_hi) # Remove data outside of xlim
+            x_result = self.x_results[key] = (x[mask], mask)
+
+        x, mask = x_result
+        y = buffer.get_tail_decimated(t_span_samples, ch_y, nth, 0, plot_channel.y_buffer)
+        plot_channel.line.setData(x, y[mask])
+
+    def update_function_xy_line(self, buffer, plot_channel, force_refresh=False):
+        """Channel vs. channel line processed by the plot function. Only data within xlim is plotted."""
+        fun_return = self.apply_function(buffer, plot_channel, force_refresh)
+        if fun_return is None:
+            return
+
+        if isinstance(fun_return, tuple):
+            x, y = fun_return
+        else:
+            x, y = fun_return[:, 0], fun_return[:, 1]
+        # contiguous columns, the transposed 2D array would be strided
+        x = np.ascontiguousarray(x[::plot_channel.nth], dtype=np.float32)
+        y = np.ascontiguousarray(y[::plot_channel.nth], dtype=np.float32)
+        self.plot_within_xlim(plot_channel, x, y)
+
+    def plot_within_xlim(self, plot_channel, x, y):
+        """Sets the points of the line with x within xlim. The output arrays of the line are reused 
+        and only reallocated when the function result gets longer."""
+        if plot_channel.x_buffer is None or plot_channel.x_buffer.shape[0] < x.shape[0]:
+            plot_channel.x_buffer = np.empty(x.shape[0], dtype=np.float32)
+            plot_channel.y_buffer = np.empty(x.shape[0], dtype=np.float32)
+        x, y = points_within_xlim(x, y, plot_channel.xlim_lo, plot_channel.xlim_hi, plot_channel.x_buffer, plot_channel.y_buffer)
+        plot_channel.line.setData(x, y)
 
 
     def close_app(self):
@@ -884,6 +1176,12 @@ class MainWindow(QMainWindow):
         if not self.measurement_stopped:
             self.stop_measurement()
 
+        self.function_pool.shutdown(wait=False)
+
+        if self.previous_config_options is not None:
+            pg.setConfigOptions(**self.previous_config_options)
+            self.previous_config_options = None
+
         self.app.quit()
         self.close()
 
@@ -903,8 +1201,10 @@ class MainWindow(QMainWindow):
         self.trigger_button.setEnabled(False)
         self.measurement_stopped = True
 
-        # Update the plots one last time.
-        self.update_plots(force_refresh=True)
+        # Update the plots one last time, unless all lines already show the last data and results.
+        new_data_read = self.update_ring_buffers()
+        if new_data_read or self.results_pending or self.lines_outdated():
+            self.update_plots(force_refresh=True)
 
         # palette = self.palette()
         # palette.setColor(self.backgroundRole(), QColor(152, 251, 251))
@@ -947,18 +1247,18 @@ class MainWindow(QMainWindow):
     def on_measurement_start(self):
         self.triggered = True
         self.trigger_button.setText('Stop measurement')
-        palette = self.palette()
-        palette.setColor(self.backgroundRole(), QColor(152, 251, 177))
-        self.setPalette(palette)
+        self.setPalette(self.palette_running)
 
 
     def toggle_freeze_plot(self):
+        # While frozen, the data is read at the regular interval, see update_plots().
         if self.freeze_plot:
             self.freeze_plot = False
             self.freeze_button.setText('Freeze')
         else:
             self.freeze_plot = True
             self.freeze_button.setText('Unfreeze')
+        self.set_timer_interval(self.vis.update_refresh_rate)
 
 
         
\ No newline at end of file
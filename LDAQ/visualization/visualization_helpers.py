@@ -1,6 +1,232 @@
 import numpy as np
-from scipy.signal import coherence, csd
+from scipy.signal import coherence, csd, get_window
+import scipy.fft
+from pyTrigger import RingBuffer2D
 import types
+import threading
+
+# numba and the optional FFT packages are imported by _load_kernels() when a visualization is started,
+# importing LDAQ does not import them.
+pyfftw = None
+
+
+def _render_identity(data, column, nth, start, out):
+    """Writes every `nth` row of one column of `data` to `out`, starting with the decimated row `start`.
+
+    Args:
+        data (np.ndarray): 2D array of the last rows of the ring buffer (a contiguous block of the mirrored buffer)
+        column (int): column index
+        nth (int): decimation step
+        start (int): first decimated row
+        out (np.ndarray): 1D output array, its length is the number of decimated rows written
+
+    Returns:
+        np.ndarray: out
+    """
+    for i in range(out.shape[0]):
+        out[i] = data[(start + i) * nth, column]
+    return out
+
+_render_identity_kernel = None # compiled kernel, see _load_kernels()
+
+
+def _render_peak(data, column, nth, start, out):
+    """Same as `_render_identity`, but every pair of decimated rows is replaced by the minimum and the maximum 
+    of the `2*nth` rows they represent, in the order in which they occurred, so that peaks between the decimated 
+    rows are not lost and falling slopes are not drawn as a sawtooth.
+
+    Args:
+        data (np.ndarray): 2D array of the last rows of the ring buffer (a contiguous block of the mirrored buffer)
+        column (int): column index
+        nth (int): decimation step
+        start (int): first decimated row
+        out (np.ndarray): 1D output array, its length is the number of decimated rows written
+
+    Returns:
+        np.ndarray: out
+    """
+    end = min((start + out.shape[0]) * nth, data.shape[0]) # rows represented by the written decimated rows
+    for p in range((out.shape[0] + 1) // 2):
+        r0 = (start + 2*p) * nth
+        r1 = min(r0 + 2*nth, end)
+        lo = data[r0, column]
+        hi = lo
+        i_lo = r0
+        i_hi = r0
+        for r in range(r0 + 1, r1):
+            value = data[r, column]
+            if value < lo:
+                lo = value
+                i_lo = r
+            elif value > hi:
+                hi = value
+                i_hi = r
+        if i_hi < i_lo:
+            lo, hi = hi, lo
+        out[2*p] = lo
+        if 2*p + 1 < out.shape[0]:
+            out[2*p + 1] = hi
+    return out
+
+_render_peak_kernel = None # compiled kernel, see _load_kernels()
+
+
+def _select_xlim(x, y, xlim_lo, xlim_hi, out_x, out_y):
+    """Copies the points with `x` within [`xlim_lo`, `xlim_hi`] to the beginning of `out_x` and `out_y`.
+
+    Args:
+        x (np.ndarray): 1D x-axis
+        y (np.ndarray): 1D y-axis, same length as `x`
+        xlim_lo (float): lower x limit
+        xlim_hi (float): upper x limit
+        out_x (np.ndarray): 1D output array, at least as long as `x`
+        out_y (np.ndarray): 1D output array, at least as long as `x`
+
+    Returns:
+        int: number of copied points
+    """
+    n = 0
+    for i in range(x.shape[0]):
+        if x[i] >= xlim_lo and x[i] <= xlim_hi:
+            out_x[n] = x[i]
+            out_y[n] = y[i]
+            n += 1
+    return n
+
+_select_xlim_kernel = None # compiled kernel, see _load_kernels()
+
+def points_within_xlim(x, y, xlim_lo, xlim_hi, out_x, out_y):
+    """Returns the points with `x` within [`xlim_lo`, `xlim_hi`]. If numba is installed, the points are copied 
+    to `out_x` and `out_y` by a compiled kernel in one pass and views of them are returned, otherwise a mask is used.
+
+    Args:
+        x (np.ndarray): 1D float32 x-axis
+        y (np.ndarray): 1D float32 y-axis, same length as `x`
+        xlim_lo (float): lower x limit
+        xlim_hi (float): upper x limit
+        out_x (np.ndarray): 1D float32 output array, at least as long as `x`, reused between calls
+        out_y (np.ndarray): 1D float32 output array, at least as long as `x`, reused between calls
+
+    Returns:
+        tuple: x and y within xlim
+    """
+    if _select_xlim_kernel is not None:
+        n = _select_xlim_kernel(x, y, float(xlim_lo), float(xlim_hi), out_x, out_y)
+        return out_x[:n], out_y[:n]
+    mask = (x >= xlim_lo) & (x <= xlim_hi)
+    return x[mask], y[mask]
+
+
+class PlotRingBuffer2D(RingBuffer2D):
+    """
+    Upgrades RingBuffer2D with reading of the last rows without copying the whole buffer.
+
+    Every row is written twice, to `data` and to the following copy of the buffer in `mirror`, so that 
+    the last rows are always a contiguous block of `mirror`.
+    """
+    def __init__(self, rows, columns, dtype='float'):
+        # RingBuffer2D.__init__() is not called, `data` is a view of the mirrored buffer instead of a separate array
+        self.rows = max(1, int(rows))
+        self.columns = columns
+        self.mirror = np.zeros((2*self.rows, columns), dtype=dtype)
+        self.data = self.mirror[:self.rows] # `data` is the first copy of the buffer
+        self.index = 0
+        self.n_written = 0 # total number of rows added to the buffer
+
+    def clear(self):
+        """Clear buffer."""
+        self.mirror.fill(0)
+        self.index = 0
+
+    def extend(self, data):
+        """adds array `data` to ring buffer, rows are copied in at most two contiguous blocks"""
+        rows_to_add = len(data)
+        if rows_to_add == 0 or len(data[0]) != self.columns:
+            return
+
+        rows = self.rows
+        if rows_to_add >= rows:
+            np.copyto(self.mirror[:rows], data[-rows:])
+            np.copyto(self.mirror[rows:], data[-rows:])
+            self.index = rows
+        else:
+            start = self.index % rows
+            n_first = min(rows_to_add, rows - start) # rows until the end of the buffer
+            for offset in (0, rows):
+                np.copyto(self.mirror[offset+start:offset+start+n_first], data[:n_first])
+                np.copyto(self.mirror[offset:offset+rows_to_add-n_first], data[n_first:])
+            self.index = (start + rows_to_add - 1) % rows + 1
+
+        self.n_written += rows_to_add
+
+    def get_tail(self, n_rows, columns=slice(None)):
+        """Returns the last `n_rows` rows of the selected columns in the first-in-first-out order.
+        
+        The rows are a contiguous block of the mirrored buffer, a view is returned unless `columns` 
+        is a tuple (fancy indexing).
+
+        Args:
+            n_rows (int): number of last rows to return
+            columns (int, tuple, slice): columns to return. Defaults to all columns.
+
+        Returns:
+            np.ndarray: last rows of the buffer
+        """
+        n_rows = min(n_rows, self.rows)
+        end = self.index + self.rows
+        return self.mirror[end-n_rows:end, columns]
+
+    def get_tail_decimated(self, n_rows, column, nth, start, out):
+        """Writes every `nth` row of the last `n_rows` rows of one column to `out`, starting with the 
+        decimated row `start`. A compiled kernel is used if numba is installed.
+
+        Args:
+            n_rows (int): number of last rows
+            column (int): column index
+            nth (int): decimation step
+            start (int): first decimated row
+            out (np.ndarray): 1D float32 output array, reused between calls
+
+        Returns:
+            np.ndarray: out
+        """
+        if _render_identity_kernel is not None:
+            return _render_identity_kernel(self.get_tail(n_rows), int(column), int(nth), int(start), out)
+        np.copyto(out, self.get_tail(n_rows, column)[::nth][start:start+out.shape[0]])
+        return out
+
+    def get_tail_peak(self, n_rows, column, nth, start, out):
+        """Same as `get_tail_decimated`, but every pair of decimated rows is replaced by the minimum and 
+        the maximum of the rows they represent, in the order in which they occurred (peak decimation). 
+        A compiled kernel is used if numba is installed.
+
+        Args:
+            n_rows (int): number of last rows
+            column (int): column index
+            nth (int): decimation step
+            start (int): first decimated row
+            out (np.ndarray): 1D float32 output array, reused between calls
+
+        Returns:
+            np.ndarray: out
+        """
+        if nth == 1:
+            return self.get_tail_decimated(n_rows, column, nth, start, out)
+        if _render_peak_kernel is not None:
+            return _render_peak_kernel(self.get_tail(n_rows), int(column), int(nth), int(start), out)
+        tail = self.get_tail(n_rows, column)[start*nth:(start+out.shape[0])*nth]
+        # pairs of 2*nth rows, the last pair is padded with its last row
+        pairs = np.empty(((out.shape[0]+1)//2, 2*nth), dtype=tail.dtype)
+        pairs.reshape(-1)[:tail.shape[0]] = tail
+        pairs.reshape(-1)[tail.shape[0]:] = tail[-1]
+        i_lo = pairs.argmin(axis=1)
+        i_hi = pairs.argmax(axis=1)
+        rows = np.arange(pairs.shape[0])
+        lo_first = i_lo <= i_hi
+        out[0::2] = np.where(lo_first, pairs[rows, i_lo], pairs[rows, i_hi])
+        out[1::2] = np.where(lo_first, pairs[rows, i_hi], pairs[rows, i_lo])[:out.shape[0]//2]
+        return out
+
 
 
 def compute_nth(max_points_to_refresh, t_span, n_lines, sample_rate):
@@ -50,11 +276,146 @@ def check_subplot_options_validity(subplot_options, layout):
 #  Prepared plot Functions
 # ------------------------------------------------------------------------------
 
+_RFFT_PLANS = threading.local() # pyFFTW plans of each thread, plans must not be executed concurrently
+_RFFT_PLANNER_LOCK = threading.Lock() # the FFTW planner is not thread-safe
+
+def _rfft(data):
+    """Real FFT of 1D data. If pyFFTW is installed, a plan with aligned buffers is created once for each 
+    data length and type in each thread and reused, otherwise scipy.fft.rfft is used.
+    
+    The array returned by the pyFFTW plan is overwritten by the next call with the same data length and type 
+    in the same thread.
+
+    Args:
+        data (np.ndarray): 1D array of real data
+
+    Returns:
+        np.ndarray: complex spectrum
+    """
+    if pyfftw is None:
+        return scipy.fft.rfft(data, workers=-1)
+
+    plans = getattr(_RFFT_PLANS, 'plans', None)
+    if plans is None:
+        plans = _RFFT_PLANS.plans = {}
+
+    key = (data.shape[0], data.dtype)
+    plan = plans.get(key)
+    if plan is None:
+        with _RFFT_PLANNER_LOCK:
+            plan = pyfftw.builders.rfft(pyfftw.empty_aligned(data.shape[0], dtype=data.dtype), 
+                                        planner_effort='FFTW_MEASURE', threads=1)
+        plans[key] = plan
+    return plan(data)
+
+def rfft_amplitude(data, sample_rate):
+    """Amplitude spectrum of 1D data, computed with scipy.fft (pocketfft), which caches the plans of 
+    recently used lengths and releases the GIL. Recommended for spectra in custom plot functions:
+
+    >>> def function(self, channel_data):
+            return rfft_amplitude(channel_data, self.acquisition.sample_rate)
+
+    Args:
+        data (np.ndarray): 1D array of real data
+        sample_rate (float): sample rate of the data
+
+    Returns:
+        tuple: (freq, amplitude) 1D arrays
+    """
+    amp = np.abs(scipy.fft.rfft(data, workers=-1)) * (2 / len(data))
+    freq = scipy.fft.rfftfreq(len(data), d=1/sample_rate)
+    return freq, amp
+
+def _fft_amplitude(data, sample_rate):
+    """Amplitude spectrum of 1D data.
+
+    Args:
+        data (np.ndarray): 1D array of real data
+        sample_rate (float): sample rate of the data
+
+    Returns:
+        tuple: (freq, amplitude) 1D arrays
+    """
+    amp = np.abs(np.fft.rfft(data)) * 2 / data.shape[0]
+    freq = np.arange(amp.shape[0]) * (sample_rate / data.shape[0])
+    return freq, amp
+
+_HANN_WINDOWS = {}
+
+def _hann_window(n):
+    """Hann window of length `n` as used by scipy.signal.csd, created once for each length and reused.
+
+    Args:
+        n (int): window length
+
+    Returns:
+        np.ndarray: window
+    """
+    window = _HANN_WINDOWS.get(n)
+    if window is None:
+        window = get_window('hann', n)
+        _HANN_WINDOWS[n] = window
+    return window
+
+_fft_amplitude_kernel = None # compiled kernel, see _load_kernels()
+
+_kernels_loaded = False
+
+def _load_kernels():
+    """Imports pyFFTW and numba (with rocket-fft), if they are installed, and creates the compiled kernels. 
+    The kernels are only created once, until then the numpy implementations are used.
+    """
+    global _kernels_loaded, pyfftw, _render_identity_kernel, _render_peak_kernel, _select_xlim_kernel, _fft_amplitude_kernel
+    if _kernels_loaded:
+        return
+    _kernels_loaded = True
+
+    try:
+        import pyfftw
+    except ImportError:
+        pyfftw = None
+
+    try:
+        from numba import njit
+    except ImportError:
+        return
+
+    _render_identity_kernel = njit(cache=True, fastmath=True)(_render_identity)
+    # no fastmath, comparisons with NaN values must be defined and NaN points must be removed
+    _render_peak_kernel = njit(cache=True)(_render_peak)
+    _select_xlim_kernel = njit(cache=True)(_select_xlim)
+
+    try:
+        import rocket_fft # registers np.fft functions with numba
+        _fft_amplitude_kernel = njit(cache=True)(_fft_amplitude)
+    except ImportError:
+        pass
+
+def _compile_kernels(fft=False):
+    """Loads (see _load_kernels()) and compiles the numba kernels before the first refresh of the plots.
+
+    Args:
+        fft (bool): also compile the kernel of the 'fft' plot function. Defaults to False.
+    """
+    _load_kernels()
+    if _render_identity_kernel is not None:
+        _render_identity_kernel(np.zeros((8, 1)), 0, 1, 0, np.empty(8, dtype=np.float32))
+    if _render_peak_kernel is not None:
+        _render_peak_kernel(np.zeros((8, 1)), 0, 2, 0, np.empty(4, dtype=np.float32))
+    if _select_xlim_kernel is not None:
+        _select_xlim_kernel(np.zeros(8, dtype=np.float32), np.zeros(8, dtype=np.float32), 0., 1., 
+                            np.empty(8, dtype=np.float32), np.empty(8, dtype=np.float32))
+    if fft and _fft_amplitude_kernel is not None:
+        _fft_amplitude_kernel(np.zeros(8), 1.)
+
 def _fun_fft(self, data):
-   amp = np.fft.rfft(data) * 2 / len(data)
+   if _fft_amplitude_kernel is not None:
+       return _fft_amplitude_kernel(np.ascontiguousarray(data, dtype=np.float64), float(self.acquisition.sample_rate))
+
+   amp = _rfft(np.asarray(data, dtype=np.float32)) * 2 / len(data) # single precision is enough for plotting
    freq = np.fft.rfftfreq(len(data), d=1/self.acquisition.sample_rate)
 
-   return np.array([freq, np.abs(amp)]).T
+   return freq, np.abs(amp)
 
 class _FRF_calculation():
     """
@@ -76,8 +437,8 @@ class _FRF_calculation():
         
         # estimate FRF:
         x, y = channel_data.T
-        X = np.fft.rfft(x)
-        Y = np.fft.rfft(y)
+        X = _rfft(x).copy()
+        Y = _rfft(y)
         Sxy = np.conj(X) * Y
         Sxx = np.conj(X) * X
         H1 = Sxy / Sxx
@@ -97,13 +458,13 @@ class _FRF_calculation():
     def get_frf_abs(self, self_vis, channel_data):
         self._calc_frf(self_vis, channel_data) # always update the FRF
         self.last_fun_call = 'abs'
-        return np.array([self.freq, np.abs(self.H1)]).T
+        return self.freq, np.abs(self.H1)
     
     def get_frf_phase(self, self_vis, channel_data):
         if self.last_fun_call == 'phase' or self.last_fun_call is None: # only update if the last call was phase
             self._calc_frf(self_vis, channel_data)
         self.last_fun_call = 'phase'
-        return np.array([self.freq, np.angle(self.H1)*180/np.pi]).T
+        return self.freq, np.angle(self.H1)*180/np.pi
     
 def _fun_frf_amp(self_vis, channel_data):   
     """Default function for calculating the FRF amplitude.
@@ -113,7 +474,7 @@ def _fun_frf_amp(self_vis, channel_data):
         channel_data (array): 2D numpy array with (time, channel) shape.
 
     Returns:
-        2D numpy array: np.array([freq, np.abs(H1)]).T
+        tuple: (freq, np.abs(H1))
     """
     # estimate FRF:
     # x, y = channel_data.T
@@ -127,11 +488,12 @@ def _fun_frf_amp(self_vis, channel_data):
     
     x, y = channel_data.T
     fs = self_vis.acquisition.sample_rate
-    freq, Sxy = csd(x, y, fs, nperseg=int(fs))
-    freq, Sxx = csd(x, x, fs, nperseg=int(fs))
+    window = _hann_window(min(int(fs), len(x)))
+    freq, Sxy = csd(x, y, fs, window=window)
+    freq, Sxx = csd(x, x, fs, window=window)
     H1 = Sxy / Sxx
     
-    return np.array([freq, np.abs(H1)]).T
+    return freq, np.abs(H1)
     
 def _fun_frf_phase(self_vis, channel_data):   
     """Default function for calculating the FRF phase.
@@ -141,16 +503,17 @@ def _fun_frf_phase(self_vis, channel_data):
         channel_data (array): 2D numpy array with (time, channel) shape.
         
     Returns:
-        2D numpy array: np.array([freq, np.angle(H1)*180/np.pi]).T
+        tuple: (freq, np.angle(H1)*180/np.pi)
     """
 
     x, y = channel_data.T
     fs = self_vis.acquisition.sample_rate
-    freq, Sxy = csd(x, y, fs, nperseg=int(fs))
-    freq, Sxx = csd(x, x, fs, nperseg=int(fs))
+    window = _hann_window(min(int(fs), len(x)))
+    freq, Sxy = csd(x, y, fs, window=window)
+    freq, Sxx = csd(x, x, fs, window=window)
     H1 = Sxy / Sxx
     
-    return np.array([freq, np.angle(H1)*180/np.pi]).T
+    return freq, np.angle(H1)*180/np.pi
 
 def _fun_coh(self_vis, channel_data):   
     """Default function for calculating the coherence.
@@ -160,14 +523,14 @@ def _fun_coh(self_vis, channel_data):
         channel_data (array): 2D numpy array with (time, channel) shape.
         
     Returns:
-        2D numpy array: np.array([freq, coherence]).T
+        tuple: (freq, coherence)
     """
     # estimate FRF:
     x, y = channel_data.T
     fs   = self_vis.acquisition.sample_rate    
-    freq, coh = coherence(x, y, fs, nperseg=fs)
+    freq, coh = coherence(x, y, fs, window=_hann_window(min(int(fs), len(x))))
     
-    return np.array([freq, coh]).T
+    return freq, coh
         
         
         